@@ -0,0 +1,425 @@
+'''ASGI entry point with async handlers for the auth and recipe endpoints.
+
+Run from the server directory with any ASGI server, e.g.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5555
+
+POST /signup, POST /login, DELETE /logout, GET /check-session, GET /recipes and
+POST /recipes are coroutines. They query through an async SQLAlchemy engine
+(aiosqlite) and await password hashing on the shared hashing pool, so a request
+waiting on a hash or the database doesn't hold a thread. Everything else, and
+GET /recipes?stream=1, is handed to the Flask app on a thread pool, so both
+deployments serve the same API.
+
+The handlers run inside a Flask request context. That lets them reuse the
+helpers in resources.py, request/session/jsonify and the server-side session store.
+The session store and rate limiter are synchronous, so they are called through
+the thread pool.
+
+Needs aiosqlite in addition to the WSGI requirements; the Pipfile's asgi category
+has it and uvicorn: pipenv install --categories="packages asgi".
+'''
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from flask import jsonify, request, session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import app as flask_app
+from resources import (
+    busy_response, check_recipe_text, data_validators, include_requested, is_not_modified,
+    not_modified_response, parse_int_arg, rate_limited_response, recipe_response, set_validators,
+    wants_stream,
+)
+from hashing import HashingUnavailable, verify_and_rehash
+from models import db, User, Recipe
+from queries import RecipeRecord, user_recipes_query
+from ratelimit import get_rate_limiter
+from sqlite_tuning import apply_sqlite_pragmas, get_sqlite_pragmas
+
+# Threads for the synchronous pieces: session store, rate limiter and Flask fallback
+executor = ThreadPoolExecutor(
+    max_workers=flask_app.config.get('ASGI_THREAD_POOL_SIZE', 32), thread_name_prefix='asgi'
+)
+
+
+def create_engine_for(app):
+    '''An aiosqlite engine on the same database file as the app's sync engine.'''
+    with app.app_context():
+        url = db.engine.url
+    engine = create_async_engine(url.set(drivername='sqlite+aiosqlite'))
+    apply_sqlite_pragmas(engine.sync_engine, get_sqlite_pragmas(app.config))
+    return engine
+
+
+engine = create_engine_for(flask_app)
+# expire_on_commit=False: attributes are read after commit and can't lazy-load in async code
+AsyncSession = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def user_summary(db_session, user, include_recipes=False):
+    '''Async counterpart of User.to_dict().'''
+    data = {
+        "id": user.id,
+        "username": user.username,
+        "bio": user.bio,
+        "image_url": user.image_url,
+    }
+    if include_recipes:
+        result = await db_session.execute(user_recipes_query(user.id))
+        data["recipes"] = [RecipeRecord(row).to_dict() for row in result]
+    else:
+        data["recipe_count"] = user.recipe_count
+        data["total_minutes"] = user.total_minutes
+        data["average_minutes"] = user.average_minutes
+    return data
+
+
+# -----------------------
+# Async handlers
+# Each mirrors the Flask view of the same name in app.py. Returning None hands
+# the request to the Flask app instead.
+# -----------------------
+ROUTES = {}
+
+def route(method, path):
+    def decorator(fn):
+        ROUTES[(method, path)] = fn
+        return fn
+    return decorator
+
+@route('POST', '/signup')
+async def signup():
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+    if not username or not password:
+        return jsonify({"errors": "Username and password required"}), 422
+
+    async with AsyncSession() as db_session:
+        if await db_session.scalar(select(User.id).where(User.username == username)):
+            return jsonify({"errors": "Username already exists"}), 422
+
+    # Hash with no session open, so no pooled connection waits on the KDF
+    user = User(username=username, bio=data.get('bio', ''), image_url=data.get('image_url'))
+    try:
+        await flask_app.extensions['hashing_pool'].run_async(user.set_password, password)
+    except HashingUnavailable:
+        return busy_response()
+
+    async with AsyncSession() as db_session:
+        db_session.add(user)
+        try:
+            await db_session.commit()
+        except IntegrityError:
+            await db_session.rollback()
+            return jsonify({"errors": "Username already exists"}), 422
+
+        session['user_id'] = user.id
+        return jsonify(await user_summary(db_session, user, include_requested('recipes'))), 201
+
+@route('POST', '/login')
+async def login():
+    data = request.get_json()
+    username = data.get('username')
+    password = data.get('password')
+
+    limiter = get_rate_limiter()
+    buckets = [('username', str(username)), ('ip', request.remote_addr)]
+    retry_after = await run_blocking(limiter.hit, buckets)
+    if retry_after is not None:
+        return rate_limited_response(retry_after)
+
+    async with AsyncSession() as db_session:
+        row = (await db_session.execute(
+            select(User.id, User._password_hash).where(User.username == username))).first()
+    if not row:
+        return jsonify({"errors": "Invalid username or password"}), 401
+
+    # The session is closed, so no pooled connection waits on the KDF
+    try:
+        authenticated, new_hash = await flask_app.extensions['hashing_pool'].run_async(
+            verify_and_rehash, password, row._password_hash)
+    except HashingUnavailable:
+        await run_blocking(limiter.refund, buckets)
+        return busy_response()
+    if not authenticated:
+        return jsonify({"errors": "Invalid username or password"}), 401
+    await run_blocking(limiter.refund, buckets)
+
+    async with AsyncSession() as db_session:
+        user = await db_session.get(User, row.id)
+        if not user:
+            return jsonify({"errors": "Invalid username or password"}), 401
+
+        # Upgrade an outdated hash, unless the password changed while we were hashing
+        if new_hash and user.password_hash == row._password_hash:
+            user._password_hash = new_hash
+            await db_session.commit()
+
+        session['user_id'] = user.id
+        return jsonify(await user_summary(db_session, user, include_requested('recipes'))), 200
+
+@route('DELETE', '/logout')
+async def logout():
+    if session.get('user_id') is None:
+        return jsonify({"errors": "Unauthorized"}), 401
+    session.pop('user_id')
+    return '', 204
+
+async def current_user(db_session):
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    user = await db_session.get(User, user_id)
+    if not user:
+        session.pop('user_id', None)
+    return user
+
+@route('GET', '/check-session')
+async def check_session():
+    async with AsyncSession() as db_session:
+        user = await current_user(db_session)
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        etag, last_modified = data_validators(user.id, user)
+        if etag and is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        response = jsonify(await user_summary(db_session, user, include_requested('recipes')))
+        if etag:
+            set_validators(response, etag, last_modified)
+        return response, 200
+
+@route('GET', '/recipes')
+async def recipe_index():
+    if wants_stream():
+        return None
+
+    async with AsyncSession() as db_session:
+        user = await current_user(db_session)
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        try:
+            limit = parse_int_arg('limit', minimum=1, maximum=flask_app.config['MAX_PAGE_SIZE'])
+            after = parse_int_arg('after')
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+
+        etag, last_modified = data_validators(user.id, user)
+        if etag and is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        query = user_recipes_query(user.id, after=after)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        records = [RecipeRecord(row) for row in await db_session.execute(query)]
+
+    response = jsonify([r.to_dict() for r in records[:limit]])
+    if limit is not None and len(records) > limit:
+        response.headers['X-Next-Cursor'] = str(records[limit - 1].id)
+    if etag:
+        set_validators(response, etag, last_modified)
+    return response, 200
+
+@route('POST', '/recipes')
+async def create_recipe():
+    async with AsyncSession() as db_session:
+        user = await current_user(db_session)
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"errors": ["Expected a JSON object"]}), 422
+        try:
+            check_recipe_text(data)
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+        try:
+            minutes_to_complete = int(data.get('minutes_to_complete', 0))
+        except (ValueError, TypeError):
+            return jsonify({"errors": "minutes_to_complete must be an integer"}), 422
+
+        try:
+            recipe = Recipe(
+                title=data.get('title'),
+                instructions=data.get('instructions'),
+                minutes_to_complete=minutes_to_complete,
+                user_id=user.id,
+            )
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+        db_session.add(recipe)
+        await db_session.commit()
+        return recipe_response(recipe, 201)
+
+
+# -----------------------
+# ASGI plumbing
+# -----------------------
+def build_environ(scope, body):
+    '''WSGI environ for an ASGI http scope, so Flask can build its request from it.'''
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def send_response(send, status, headers, chunks):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+    })
+    async for chunk in chunks:
+        if chunk:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def call_flask(environ, send):
+    '''Run the WSGI app on the thread pool and relay its response.
+
+    The whole WSGI call, including iterating the body, stays on one thread
+    because streamed responses keep Flask's context open across chunks. Chunks
+    come back through a small queue so a slow client holds back the producer.
+    '''
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=8)
+    done = object()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        try:
+            iterable = flask_app(environ, start_response)
+            try:
+                put((started['status'], started['headers']))
+                for chunk in iterable:
+                    put(chunk)
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        except BaseException as e:
+            put(e)
+        finally:
+            put(done)
+
+    producer = loop.run_in_executor(executor, produce)
+
+    async def chunks():
+        while (item := await queue.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    stream = chunks()
+    start = await stream.__anext__()
+    await send_response(send, *start, stream)
+    await producer
+
+async def call_handler(handler, environ, send):
+    '''Run an async handler in a Flask request context with the server-side session.'''
+    interface = flask_app.session_interface
+    ctx = flask_app.request_context(environ)
+    # Opened here on a thread so RequestContext.push() doesn't load it on the event loop
+    ctx.session = await run_blocking(interface.open_session, flask_app, ctx.request)
+    if ctx.session is None:
+        ctx.session = interface.make_null_session(flask_app)
+
+    ctx.push()
+    try:
+        try:
+            rv = await handler()
+        except HTTPException as e:
+            rv = e
+        if rv is None:
+            return False
+        response = flask_app.make_response(rv)
+        if not interface.is_null_session(ctx.session):
+            await run_blocking(interface.save_session, flask_app, ctx.session, response)
+    except Exception:
+        flask_app.logger.exception("Unhandled error in async handler")
+        response = flask_app.make_response(
+            (jsonify({"errors": ["An unexpected error occurred"]}), 500)
+        )
+    finally:
+        ctx.pop()
+
+    async def body():
+        yield response.get_data()
+
+    await send_response(send, response.status_code, response.headers.to_wsgi_list(), body())
+    return True
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    body = await read_body(receive)
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None or not await call_handler(handler, build_environ(scope, body), send):
+        await call_flask(build_environ(scope, body), send)
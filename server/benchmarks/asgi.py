@@ -0,0 +1,129 @@
+'''WSGI vs ASGI deployment under rising concurrency.
+
+Run from the server directory:
+
+    python -m benchmarks.asgi --concurrency 10 100 400 --scenarios login check-session recipe-page
+
+Seeds a throwaway database like benchmarks.load. It then serves the app twice
+in this process, once from werkzeug's threaded WSGI server (one thread per
+connection) and once from uvicorn running asgi.application. For each concurrency
+level, the same load.py scenarios are sent over real HTTP. The report adds the
+peak number of extra server-side threads, which is what the WSGI deployment spends
+per concurrent connection and the ASGI one does not.
+
+Needs uvicorn and aiosqlite.
+'''
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.load import HTTPDriver, load_app, run_scenario, scenarios, seed
+
+
+class ThreadSampler(threading.Thread):
+    '''Records the peak number of live threads that aren't benchmark clients.'''
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.baseline = self.count()
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def count():
+        # load.run_scenario's client threads run its worker() function
+        return sum(1 for t in threading.enumerate() if not t.name.endswith('(worker)'))
+
+    def run(self):
+        while not self.stopped.wait(0.01):
+            self.peak = max(self.peak, self.count() - self.baseline)
+
+
+def start_wsgi(app):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server.shutdown
+
+
+def start_asgi():
+    import socket
+    import uvicorn
+    import asgi
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(
+        asgi.application, host='127.0.0.1', port=port, log_level='warning', backlog=4096))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+    return f'http://127.0.0.1:{port}', stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 400])
+    parser.add_argument('--requests-per-client', type=int, default=10)
+    parser.add_argument('--scenarios', nargs='+', default=['login', 'check-session', 'recipe-page'])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes-per-user', type=int, default=20)
+    parser.add_argument('--pbkdf2-iterations', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    fd, database_path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    try:
+        app = load_app(database_path, args)
+        seed(app, args)
+        # Every client logs in from 127.0.0.1 at once: let those logins queue for
+        # the hashing pool rather than get a 503, and lift the per-address limit
+        from hashing import HashingPool
+        from ratelimit import MemoryBackend, RateLimiter
+        app.extensions['hashing_pool'] = HashingPool(
+            workers=app.config['HASHING_POOL_WORKERS'], max_pending=max(args.concurrency),
+            timeout=60)
+        app.extensions['rate_limiter'] = RateLimiter(MemoryBackend(), {'username': (10 ** 6, 1), 'ip': (10 ** 6, 1)})
+        available = scenarios(args)
+
+        header = f"{'server':<7}{'scenario':<16}{'conc':>6}{'reqs':>7}{'errors':>8}" \
+                 f"{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'threads':>9}"
+        print(header)
+        print('-' * len(header))
+        for server_name, start in (('wsgi', lambda: start_wsgi(app)), ('asgi', start_asgi)):
+            base_url, stop = start()
+            try:
+                for concurrency in args.concurrency:
+                    for name in args.scenarios:
+                        run_args = argparse.Namespace(**vars(args))
+                        run_args.concurrency = concurrency
+                        run_args.requests = concurrency * args.requests_per_client
+
+                        sampler = ThreadSampler()
+                        sampler.start()
+                        r = run_scenario(name, available[name], lambda: HTTPDriver(base_url), run_args)
+                        sampler.stopped.set()
+                        sampler.join()
+
+                        print(f"{server_name:<7}{name:<16}{concurrency:>6}{r['requests']:>7}{r['errors']:>8}"
+                              f"{r['rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{sampler.peak:>9}")
+            finally:
+                stop()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database_path + suffix):
+                os.remove(database_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
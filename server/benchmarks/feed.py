@@ -0,0 +1,124 @@
+'''Latency of GET /feed as the recipe table and page depth grow.
+
+Run from the server directory:
+
+    python -m benchmarks.feed --recipes 1000000
+    python -m benchmarks.feed --recipes 10000000 --keep /tmp/feed.sqlite3   # reuse the file next time
+
+Loads a SQLite file with --recipes synthetic recipes spread over --users
+authors. Then, for each feed query shape, it walks --pages pages through the
+X-Next-Cursor header. It reports latency for the first and last pages and p95
+over every page. With keyset pagination and the (minutes_to_complete, id, user_id) and
+(user_id, id) indexes, the last page should cost about the same as the first.
+'''
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def load(path, args):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import app
+    from models import db
+
+    with app.app_context():
+        if db.session.execute(db.text("SELECT count(*) FROM sqlite_master WHERE name = 'recipe'")).scalar():
+            return app
+        db.create_all()
+
+    # The search triggers would index every row; the feed doesn't need them
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("DROP TRIGGER IF EXISTS recipe_fts_ai")
+    conn.executemany(
+        "INSERT INTO user (id, username, _password_hash, data_version) VALUES (?, ?, 'x', 0)",
+        ((i, f'user{i}') for i in range(1, args.users + 1)),
+    )
+    rng = random.Random(args.seed)
+    instructions = 'Combine everything in a pot and simmer gently until done.'
+    start = time.perf_counter()
+    for chunk_start in range(0, args.recipes, 100000):
+        size = min(100000, args.recipes - chunk_start)
+        conn.executemany(
+            "INSERT INTO recipe (title, instructions, minutes_to_complete, user_id) VALUES (?, ?, ?, ?)",
+            ((f'Recipe {chunk_start + i}', instructions, rng.randint(1, 240), rng.randint(1, args.users))
+             for i in range(size)),
+        )
+        conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    print(f"loaded {args.recipes} recipes in {time.perf_counter() - start:.1f}s")
+    return app
+
+
+def walk(client, url, pages):
+    latencies = []
+    for _ in range(pages):
+        start = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - start)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        base = url.split('&after=')[0]
+        url = f'{base}&after={cursor}'
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--keep', help='database file to create or reuse instead of a temp file')
+    args = parser.parse_args()
+
+    if args.keep:
+        path = args.keep
+    else:
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        os.remove(path)
+
+    try:
+        app = load(path, args)
+        author = random.Random(args.seed).randint(1, args.users)
+        shapes = {
+            'newest': f'/feed?limit={args.limit}',
+            'quickest': f'/feed?sort=quickest&limit={args.limit}',
+            'quickest 30-60 min': f'/feed?sort=quickest&min_minutes=30&max_minutes=60&limit={args.limit}',
+            'newest by author': f'/feed?author_id={author}&limit={args.limit}',
+            'quickest by author': f'/feed?sort=quickest&author_id={author}&limit={args.limit}',
+            'newest under 15 min': f'/feed?max_minutes=15&limit={args.limit}',
+        }
+
+        header = f"{'query':<22}{'pages':>7}{'first ms':>10}{'last ms':>10}{'p95 ms':>10}"
+        print(header)
+        print('-' * len(header))
+        with app.test_client() as client:
+            for name, url in shapes.items():
+                walk(client, url, 1)  # warm the page cache
+                latencies = walk(client, url, args.pages)
+                print(f"{name:<22}{len(latencies):>7}{latencies[0] * 1000:>10.2f}"
+                      f"{latencies[-1] * 1000:>10.2f}{percentile(latencies, 95) * 1000:>10.2f}")
+    finally:
+        if not args.keep:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+'''Load benchmark for the auth and recipe endpoints.
+
+Run from the server directory:
+
+    python -m benchmarks.load --users 200 --recipes-per-user 50 --requests 500 --concurrency 8
+    python -m benchmarks.load --mode wsgi            # real HTTP against a local threaded server
+    python -m benchmarks.load --save-baseline        # record benchmarks/baselines/load-<mode>.json
+    python -m benchmarks.load --compare              # exit 1 if a scenario regressed, 2 if there is no baseline
+
+The app runs against a throwaway SQLite file seeded with Faker data, so the
+numbers don't depend on whatever is in instance/db.sqlite3. Each scenario sends
+--requests requests from --concurrency threads. The report shows p50/p95/p99
+latency and requests per second.
+'''
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from faker import Faker
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+PASSWORD = 'benchmark-password'
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class TestClientDriver:
+    '''Talks to the app in-process through app.test_client().'''
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        response.close()
+        return response.status_code
+
+
+class HTTPDriver:
+    '''Talks to a running server over HTTP, keeping cookies like a browser.'''
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header('Content-Type', 'application/json')
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def load_app(database_path, args):
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    from app import app
+    from models import db
+
+    app.config['PBKDF2_ITERATIONS'] = args.pbkdf2_iterations
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, args):
+    from sqlalchemy import insert
+    from models import db, User, Recipe
+    from hashing import hash_password
+
+    fake = Faker()
+    Faker.seed(args.seed)
+    rng = random.Random(args.seed)
+    with app.app_context():
+        # Hashing is deliberately slow, so every synthetic user shares one hash
+        password_hash = hash_password(PASSWORD)
+        db.session.execute(insert(User), [
+            {'id': i, 'username': f'user{i}', '_password_hash': password_hash,
+             'bio': fake.sentence(), 'image_url': fake.image_url()}
+            for i in range(1, args.users + 1)
+        ])
+        rows = []
+        for user_id in range(1, args.users + 1):
+            for _ in range(args.recipes_per_user):
+                rows.append({
+                    'title': fake.sentence(nb_words=4)[:100],
+                    'instructions': fake.paragraph(nb_sentences=6).ljust(50, '.'),
+                    'minutes_to_complete': rng.randint(5, 120),
+                    'user_id': user_id,
+                })
+            if len(rows) >= 5000:
+                db.session.execute(insert(Recipe), rows)
+                rows = []
+        if rows:
+            db.session.execute(insert(Recipe), rows)
+        db.session.commit()
+
+
+def scenarios(args):
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+    instructions = 'Whisk everything together and bake until golden brown. ' * 2
+
+    def next_id():
+        with counter_lock:
+            return next(counter)
+
+    return {
+        'signup': lambda d, rng: d.request('POST', '/signup', {
+            'username': f'signup{next_id()}', 'password': PASSWORD}),
+        'login': lambda d, rng: d.request('POST', '/login', {
+            'username': f'user{rng.randint(1, args.users)}', 'password': PASSWORD}),
+        'check-session': lambda d, rng: d.request('GET', '/check-session'),
+        'recipe-list': lambda d, rng: d.request('GET', '/recipes'),
+        'recipe-page': lambda d, rng: d.request('GET', '/recipes?limit=20'),
+        'recipe-create': lambda d, rng: d.request('POST', '/recipes', {
+            'title': 'Benchmark bread', 'instructions': instructions,
+            'minutes_to_complete': rng.randint(5, 120)}),
+    }
+
+
+def run_scenario(name, call, make_driver, args):
+    per_thread = max(1, args.requests // args.concurrency)
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    ready = threading.Barrier(args.concurrency + 1)
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        driver = make_driver()
+        # Every scenario except signup/login runs as a logged in user
+        driver.request('POST', '/login', {
+            'username': f'user{index % args.users + 1}', 'password': PASSWORD})
+        ready.wait()
+        local, local_errors = [], 0
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            status = call(driver, rng)
+            local.append(time.perf_counter() - start)
+            if status >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    '''Names of scenarios whose p95 grew or whose throughput fell by more than tolerance.'''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance) or \
+                result['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['client', 'wsgi'], default='client')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes-per-user', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--scenarios', nargs='+')
+    parser.add_argument('--pbkdf2-iterations', type=int, default=260000)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--baseline', help='baseline file (default: baselines/load-<mode>.json)')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'load-{args.mode}.json')
+    # Checked before the run so a missing file doesn't cost a whole benchmark
+    if args.compare and not args.save_baseline and not os.path.exists(baseline_path):
+        parser.error(f"no baseline at {baseline_path}; run with --save-baseline first")
+
+    fd, database_path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    server = None
+    try:
+        app = load_app(database_path, args)
+        seed(app, args)
+
+        if args.mode == 'wsgi':
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+            make_driver = lambda: HTTPDriver(base_url)
+        else:
+            make_driver = lambda: TestClientDriver(app)
+
+        available = scenarios(args)
+        names = args.scenarios or list(available)
+        results = {}
+
+        header = f"{'scenario':<16}{'reqs':>7}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        print(header)
+        print('-' * len(header))
+        for name in names:
+            r = results[name] = run_scenario(name, available[name], make_driver, args)
+            print(f"{name:<16}{r['requests']:>7}{r['errors']:>8}{r['rps']:>10.1f}"
+                  f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database_path + suffix):
+                os.remove(database_path + suffix)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2, sort_keys=True)
+        print(f"saved baseline to {baseline_path}")
+
+    if args.compare:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        if regressions:
+            print(f"regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+'''Connection pool settings under concurrent recipe reads and writes.
+
+Run from the server directory:
+
+    python -m benchmarks.pool --concurrency 32 --requests 2000
+    python -m benchmarks.pool --pools default queue-small null --scenarios mixed
+
+Seeds a throwaway database like benchmarks.load. It then builds the app once per
+pool preset (see POOLS) with create_app() and runs each scenario from threads
+through the test client. Besides latency, the report shows what the primary
+engine's pool did:
+- conns: connections it had to open. High numbers mean churn.
+- wait ms: average and worst wait for a connection.
+- timeouts: checkouts that gave up.
+'''
+import argparse
+import os
+import tempfile
+
+from benchmarks.load import TestClientDriver, run_scenario, scenarios, seed
+
+# Preset name -> DB_POOL_* settings on top of config.Config ('default' is SQLAlchemy's own)
+POOLS = {
+    'default': {'DB_POOL_SIZE': None, 'DB_POOL_MAX_OVERFLOW': None, 'DB_POOL_TIMEOUT': None},
+    'config': {},
+    'queue-small': {'DB_POOL_SIZE': 2, 'DB_POOL_MAX_OVERFLOW': 0, 'DB_POOL_TIMEOUT': 30},
+    'queue-churn': {'DB_POOL_SIZE': 1, 'DB_POOL_MAX_OVERFLOW': 100},
+    'queue-large': {'DB_POOL_SIZE': 40, 'DB_POOL_MAX_OVERFLOW': 0},
+    'pre-ping': {'DB_POOL_SIZE': 40, 'DB_POOL_MAX_OVERFLOW': 0, 'DB_POOL_PRE_PING': True},
+    'recycle': {'DB_POOL_SIZE': 40, 'DB_POOL_MAX_OVERFLOW': 0, 'DB_POOL_RECYCLE': 0.05},
+    'null': {'DB_POOL_CLASS': 'null'},
+}
+
+COUNTERS = ('checkouts', 'wait_seconds', 'timeouts', 'opened')
+
+
+def build_app(database_path, pool_settings, args):
+    from app import create_app
+    from config import Config
+
+    settings = dict(
+        pool_settings,
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{database_path}',
+        PBKDF2_ITERATIONS=args.pbkdf2_iterations,
+        HASHING_POOL_MAX_PENDING=args.concurrency,
+        SESSION_SWEEP_INTERVAL=0,
+    )
+    return create_app(type('BenchConfig', (Config,), settings))
+
+
+def mixed(available, write_ratio):
+    def call(driver, rng):
+        name = 'recipe-create' if rng.random() < write_ratio else 'recipe-page'
+        return available[name](driver, rng)
+    return call
+
+
+def snapshot(stats):
+    return {name: getattr(stats, name) for name in COUNTERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pools', nargs='+', choices=list(POOLS), default=list(POOLS))
+    parser.add_argument('--scenarios', nargs='+', default=['recipe-page', 'recipe-create', 'mixed'])
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='share of writes in the mixed scenario')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes-per-user', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--pbkdf2-iterations', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    from models import db
+
+    fd, database_path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    try:
+        header = f"{'pool':<13}{'scenario':<15}{'reqs':>6}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}" \
+                 f"{'conns':>7}{'wait ms':>9}{'max ms':>9}{'timeouts':>10}"
+        print(header)
+        print('-' * len(header))
+        seeded = False
+        for pool_name in args.pools:
+            app = build_app(database_path, POOLS[pool_name], args)
+            if not seeded:
+                with app.app_context():
+                    db.create_all()
+                seed(app, args)
+                seeded = True
+            available = scenarios(args)
+            available['mixed'] = mixed(available, args.write_ratio)
+            stats = app.extensions['db_pools']['primary']
+
+            for name in args.scenarios:
+                before = snapshot(stats)
+                stats.max_wait_seconds = 0.0
+                r = run_scenario(name, available[name], lambda: TestClientDriver(app), args)
+                delta = {key: value - before[key] for key, value in snapshot(stats).items()}
+                avg_wait_ms = delta['wait_seconds'] / delta['checkouts'] * 1000 if delta['checkouts'] else 0.0
+                print(f"{pool_name:<13}{name:<15}{r['requests']:>6}{r['errors']:>8}{r['rps']:>9.1f}"
+                      f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{delta['opened']:>7}{avg_wait_ms:>9.3f}"
+                      f"{stats.max_wait_seconds * 1000:>9.2f}{delta['timeouts']:>10}")
+
+            with app.app_context():
+                db.engine.dispose()
+            app.extensions['session_store'].engine.dispose()
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database_path + suffix):
+                os.remove(database_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+'''Latency of GET /recipes/search as the recipe table grows.
+
+Run from the server directory:
+
+    python -m benchmarks.search --users 1000 --recipes-per-user 1000
+    python -m benchmarks.search --keep /tmp/search.sqlite3   # reuse the file next time
+
+Seeds a SQLite file through seed.py, so titles and instructions are Faker text
+and the search index is built the way production builds it. Then it logs in as
+one user and times each query shape (common words, one to four character
+prefixes, a rare word, two words) through the test client. Searches only rank
+that user's recipes, so latency should follow recipes per user rather than the
+size of the table.
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+
+QUERIES = {
+    'common word': 'the',
+    'rare word': 'economic',
+    'two words': 'test run',
+    '1-char prefix': 'a*',
+    '2-char prefix': 'pr*',
+    '3-char prefix': 'sea*',
+    '4-char prefix': 'meth*',
+}
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def load(path, args):
+    from app import create_app
+    from config import Config
+    from models import db, User
+    from seed import seed_database
+
+    app = create_app(type('BenchConfig', (Config,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SESSION_SWEEP_INTERVAL': 0,
+    }))
+    with app.app_context():
+        db.create_all()
+        if not User.query.first():
+            seed_database(args.users, args.recipes_per_user, random_seed=args.seed)
+            db.session.execute(db.text("ANALYZE"))
+            db.session.commit()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--recipes-per-user', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=20, help='timed requests per query')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--keep', help='database file to create or reuse instead of a temp file')
+    args = parser.parse_args()
+
+    if args.keep:
+        path = args.keep
+    else:
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        os.remove(path)
+
+    try:
+        app = load(path, args)
+        from models import User
+
+        with app.app_context():
+            users = User.query.count()
+            user = User.query.offset(random.Random(args.seed).randrange(users)).first()
+            username = user.username
+
+        header = f"{'query':<16}{'q':<11}{'results':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+        print(header)
+        print('-' * len(header))
+        with app.test_client() as client:
+            client.post('/login', json={'username': username, 'password': 'password123'})
+            for name, q in QUERIES.items():
+                url = f'/recipes/search?q={q}&limit={args.limit}'
+                results = len(client.get(url).get_json())  # also warms the page cache
+                latencies = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    client.get(url)
+                    latencies.append(time.perf_counter() - start)
+                print(f"{name:<16}{q:<11}{results:>8}{percentile(latencies, 50) * 1000:>10.2f}"
+                      f"{percentile(latencies, 95) * 1000:>10.2f}{max(latencies) * 1000:>10.2f}")
+    finally:
+        if not args.keep:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
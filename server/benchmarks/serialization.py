@@ -0,0 +1,101 @@
+'''Cost of turning a user's recipes into a JSON response, by serialization path.
+
+Run from the server directory:
+
+    python -m benchmarks.serialization --recipes 10000 50000 --repeat 5
+
+Paths compared, each producing the body for GET /recipes:
+
+    orm + json indent     Recipe ORM objects -> to_dict() -> stdlib json with indent=2
+                          (the old app.json.compact = False behaviour)
+    orm + json compact    Recipe ORM objects -> to_dict() -> compact stdlib json
+    rows + json compact   Core rows of the serialized columns -> dicts -> compact stdlib json
+    rows + orjson         Core rows of the serialized columns -> dicts -> orjson (if installed)
+    records + orjson      queries.fetch_records() __slots__ records -> dicts -> orjson (if installed)
+
+Times cover the query, row handling and encoding, and are the best of --repeat
+runs. Peak memory is measured with tracemalloc in one extra run.
+'''
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert, select
+
+import json_provider
+
+INSTRUCTIONS = 'Combine everything in a pot and simmer gently until the sauce thickens nicely.'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import app
+    from models import db, User, Recipe
+    from queries import fetch_records, user_recipes_query
+
+    def orm_dicts(user_id):
+        return [r.to_dict() for r in Recipe.query.filter(Recipe.user_id == user_id).order_by(Recipe.id)]
+
+    def row_dicts(user_id):
+        query = select(*Recipe.serialized_columns()).where(Recipe.user_id == user_id).order_by(Recipe.id)
+        return [row._asdict() for row in db.session.execute(query)]
+
+    paths = {
+        'orm + json indent': lambda u: json.dumps(orm_dicts(u), indent=2),
+        'orm + json compact': lambda u: json.dumps(orm_dicts(u), separators=(',', ':')),
+        'rows + json compact': lambda u: json.dumps(row_dicts(u), separators=(',', ':')),
+    }
+    if json_provider.orjson is not None:
+        paths['rows + orjson'] = lambda u: json_provider.orjson.dumps(row_dicts(u))
+        paths['records + orjson'] = lambda u: json_provider.orjson.dumps(
+            [r.to_dict() for r in fetch_records(user_recipes_query(u))])
+
+    try:
+        with app.app_context():
+            db.create_all()
+            header = f"{'recipes':>8}  {'path':<22}{'ms':>10}{'body KiB':>10}{'peak KiB':>10}"
+            print(header)
+            print('-' * len(header))
+            for user_id, count in enumerate(args.recipes, start=1):
+                db.session.execute(insert(User).values(id=user_id, username=f'user{user_id}', _password_hash='x'))
+                db.session.execute(insert(Recipe), [
+                    {'title': f'Recipe {i}', 'instructions': INSTRUCTIONS,
+                     'minutes_to_complete': 30, 'user_id': user_id}
+                    for i in range(count)
+                ])
+                db.session.commit()
+
+                for name, run in paths.items():
+                    best = float('inf')
+                    for _ in range(args.repeat):
+                        # Start each run with an empty identity map, like a fresh request
+                        db.session.remove()
+                        start = time.perf_counter()
+                        body = run(user_id)
+                        best = min(best, time.perf_counter() - start)
+
+                    db.session.remove()
+                    tracemalloc.start()
+                    run(user_id)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    print(f"{count:>8}  {name:<22}{best * 1000:>10.1f}{len(body) / 1024:>10.0f}{peak / 1024:>10.0f}")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+'''Mixed read/write load against each SQLite profile in sqlite_tuning.py.
+
+Run from the server directory:
+
+    python -m benchmarks.sqlite_profiles --threads 8 --seconds 5 --write-ratio 0.2
+
+Each profile gets a fresh database file seeded with the same data. Worker
+threads then loop for a fixed time, either reading one user's latest recipes or
+inserting a recipe and committing. The report shows throughput, read and write
+latency percentiles, and how many operations failed with "database is locked".
+'''
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+
+from models import db, User, Recipe
+from sqlite_tuning import SQLITE_PROFILES, apply_sqlite_pragmas
+
+INSTRUCTIONS = "Mix ingredients thoroughly and cook on a hot griddle until golden brown."
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def seed(engine, users, recipes_per_user):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': i, 'username': f'user{i}', '_password_hash': 'x'} for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Recipe), [
+            {'title': f'Recipe {i}', 'instructions': INSTRUCTIONS,
+             'minutes_to_complete': 30, 'user_id': i % users + 1}
+            for i in range(users * recipes_per_user)
+        ])
+
+
+def run_profile(name, args):
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    engine = create_engine(f'sqlite:///{path}', pool_size=args.threads, max_overflow=0)
+    apply_sqlite_pragmas(engine, SQLITE_PROFILES[name])
+    seed(engine, args.users, args.recipes_per_user)
+
+    reads, writes, locked = [], [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        local_reads, local_writes, local_locked = [], [], 0
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, args.users)
+            start = time.perf_counter()
+            try:
+                if rng.random() < args.write_ratio:
+                    with engine.begin() as conn:
+                        conn.execute(insert(Recipe).values(
+                            title='Benchmark', instructions=INSTRUCTIONS,
+                            minutes_to_complete=10, user_id=user_id))
+                    local_writes.append(time.perf_counter() - start)
+                else:
+                    with engine.connect() as conn:
+                        conn.execute(
+                            select(Recipe.id, Recipe.title)
+                            .where(Recipe.user_id == user_id)
+                            .order_by(Recipe.id.desc())
+                            .limit(20)
+                        ).all()
+                    local_reads.append(time.perf_counter() - start)
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                local_locked += 1
+        with lock:
+            reads.extend(local_reads)
+            writes.extend(local_writes)
+            locked[0] += local_locked
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    engine.dispose()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    return {
+        'profile': name,
+        'ops_per_sec': (len(reads) + len(writes)) / args.seconds,
+        'read_p50_ms': percentile(reads, 50) * 1000,
+        'read_p99_ms': percentile(reads, 99) * 1000,
+        'write_p50_ms': percentile(writes, 50) * 1000,
+        'write_p99_ms': percentile(writes, 99) * 1000,
+        'locked': locked[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes-per-user', type=int, default=100)
+    parser.add_argument('--profiles', nargs='+', default=sorted(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    print("latencies in ms")
+    header = f"{'profile':<12}{'ops/s':>10}{'read p50':>10}{'read p99':>10}{'write p50':>11}{'write p99':>11}{'locked':>8}"
+    print(header)
+    print('-' * len(header))
+    for name in args.profiles:
+        r = run_profile(name, args)
+        print(f"{r['profile']:<12}{r['ops_per_sec']:>10.0f}{r['read_p50_ms']:>10.2f}{r['read_p99_ms']:>10.2f}"
+              f"{r['write_p50_ms']:>11.2f}{r['write_p99_ms']:>11.2f}{r['locked']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+'''Cold start of a worker: importing the app and serving its first request.
+
+Run from the server directory:
+
+    python -m benchmarks.startup --runs 20
+    python -m benchmarks.startup --server-dir /path/to/other/checkout/server
+
+Each run is a fresh interpreter that imports app.py, as a WSGI worker does on
+boot, and then sends one GET /check-session through the test client. The report
+gives the median and best time for the import, the first request and the whole
+process, plus the peak RSS and number of loaded modules. --server-dir points it
+at another checkout, so two versions can be compared on the same machine.
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/check-session')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def run_once(server_dir, env):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=server_dir, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--server-dir', default=os.getcwd())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The first request needs no tables, so an empty database file will do
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.sqlite3')}")
+        # Warm the OS file cache so every measured run starts from the same state
+        run_once(args.server_dir, env)
+        runs = [run_once(args.server_dir, env) for _ in range(args.runs)]
+
+    print(f"{'metric':<20}{'median':>10}{'best':>10}")
+    print('-' * 40)
+    for key in ('import_ms', 'first_request_ms', 'process_ms', 'rss_mb', 'modules'):
+        values = [r[key] for r in runs]
+        print(f"{key:<20}{statistics.median(values):>10.1f}{min(values):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models import db, User, Recipe
+
+
+class TTLCache:
+    '''Thread-safe LRU cache whose entries also expire ttl seconds after being set.'''
+
+    def __init__(self, maxsize=1024, ttl=30, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Column values of recently seen users, keyed by id. Only plain column values are
+# stored so nothing here is tied to a particular SQLAlchemy session.
+user_cache = TTLCache()
+
+USER_COLUMNS = [attr.key for attr in User.__mapper__.column_attrs]
+
+
+def init_user_cache(app):
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', 1024)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', 30)
+    user_cache.clear()
+
+
+def load_user(user_id, data_version=None):
+    '''Return the User for user_id attached to db.session, skipping the SELECT on a cache hit.
+
+    Pass the data_version just read from the database to reload a cached row that
+    is older than it, e.g. before rendering data under an ETag built from it.
+    '''
+    columns = user_cache.get(user_id)
+    if columns is not None and data_version is not None and columns['data_version'] != data_version:
+        user_cache.pop(user_id)
+        columns = None
+    if columns is None:
+        # populate_existing replaces a stale copy already merged into this session
+        user = db.session.get(User, user_id, populate_existing=data_version is not None)
+        if user is not None:
+            user_cache.set(user_id, {key: getattr(user, key) for key in USER_COLUMNS})
+        return user
+
+    user = User(**columns)
+    # Mark the rebuilt instance as loaded so merge() attaches it without a query
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def load_users(user_ids):
+    '''Column values of the users in user_ids that exist, keyed by id.
+
+    Cached users cost nothing; the rest are read with a single IN query and cached.
+    '''
+    found = {}
+    missing = []
+    for user_id in user_ids:
+        columns = user_cache.get(user_id)
+        if columns is None:
+            missing.append(user_id)
+        else:
+            found[user_id] = columns
+    if missing:
+        rows = db.session.execute(
+            select(*[getattr(User, key) for key in USER_COLUMNS]).where(User.id.in_(missing))
+        )
+        for row in rows:
+            columns = dict(zip(USER_COLUMNS, row))
+            user_cache.set(columns['id'], columns)
+            found[columns['id']] = columns
+    return found
+
+
+def changed_user_ids(obj):
+    if isinstance(obj, User):
+        return [obj.id]
+    if isinstance(obj, Recipe):
+        # The owner's recipe aggregates change with its recipes (see stats.py)
+        return [obj.user_id, *inspect(obj).attrs.user_id.history.deleted]
+    return []
+
+
+@event.listens_for(Session, 'after_flush')
+def evict_flushed_users(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for user_id in changed_user_ids(obj):
+            if user_id is not None:
+                user_cache.pop(user_id)
+                session.info.setdefault('evicted_user_ids', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def evict_committed_users(session):
+    # Evict again in case another request re-cached the old row before we committed
+    for user_id in session.info.pop('evicted_user_ids', ()):
+        user_cache.pop(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_evicted_users(session):
+    session.info.pop('evicted_user_ids', None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def evict_on_bulk_user_changes(orm_execute_state):
+    # Query.delete()/update() and bulk inserts bypass the flush, so drop everything.
+    # Recipe statements count too: the triggers update their owners' aggregates.
+    if orm_execute_state.is_delete or orm_execute_state.is_update or orm_execute_state.is_insert:
+        if any(mapper.class_ in (User, Recipe) for mapper in orm_execute_state.all_mappers):
+            user_cache.clear()
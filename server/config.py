@@ -1,24 +1,75 @@
-from flask import Flask
-from flask_bcrypt import Bcrypt
-from flask_migrate import Migrate
-from flask_restful import Api
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+'''Settings for create_app() in app.py.
 
-app = Flask(__name__)
-app.secret_key = b'Y\xf1Xz\x00\xad|eQ\x80t \xca\x1a\x10K'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.json.compact = False
+Values that differ between deployments come from environment variables, read
+when this module is first imported. Subclass Config to change anything else:
 
-metadata = MetaData(naming_convention={
-    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
-})
-db = SQLAlchemy(metadata=metadata)
+    class BenchConfig(Config):
+        PBKDF2_ITERATIONS = 50000
 
-migrate = Migrate(app, db)
-db.init_app(app)
+    app = create_app(BenchConfig)
+'''
+import os
+from datetime import timedelta
 
-bcrypt = Bcrypt(app)
 
-api = Api(app)
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replicas for GET requests (see replicas.py), e.g. DATABASE_REPLICA_URLS=sqlite:///a.db,sqlite:///b.db
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+    # After a write, the session reads from the primary for this many seconds
+    REPLICA_STICKY_SECONDS = 5
+    # Connection pool for every engine, see pooling.py; None keeps SQLAlchemy's default.
+    # A fixed pool without overflow: overflow connections are closed as soon as they
+    # are returned, which churns connections under load, and extra connections only
+    # make SQLite's single writer queue longer. Requests beyond the pool wait for a
+    # connection instead.
+    DB_POOL_CLASS = os.environ.get('DB_POOL_CLASS') or None
+    DB_POOL_SIZE = 10
+    DB_POOL_MAX_OVERFLOW = 0
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = None
+    DB_POOL_PRE_PING = None
+    SECRET_KEY = 'super-secret-key'
+    # 'orjson' (used when installed) or 'json' for the stdlib encoder
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'orjson')
+    # Connection PRAGMAs for SQLite, see sqlite_tuning.SQLITE_PROFILES
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    # Server-Timing headers and /metrics (Prometheus text format); off unless enabled
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '') == '1'
+    # Largest page a client can ask for with ?limit= on list endpoints
+    MAX_PAGE_SIZE = 1000
+    # Most ids GET /users?ids= looks up in one request
+    USER_LOOKUP_MAX_IDS = 100
+    # Rows fetched per round trip when streaming a list response
+    STREAM_BATCH_SIZE = 500
+    # POST /recipes/bulk: most items per request and rows per executemany batch
+    BULK_MAX_ITEMS = 10000
+    BULK_INSERT_BATCH_SIZE = 1000
+    # Password hasher for new hashes: pbkdf2, bcrypt or scrypt. Cost is tuned with
+    # PBKDF2_ITERATIONS, BCRYPT_LOG_ROUNDS and SCRYPT_N/R/P (see hashing.DEFAULTS).
+    # Existing hashes keep verifying and are upgraded on the next successful login.
+    PASSWORD_HASHER = 'pbkdf2'
+    # Hashing runs on a bounded pool; requests beyond workers + pending get a 503
+    HASHING_POOL_WORKERS = 4
+    HASHING_POOL_MAX_PENDING = 32
+    HASHING_TIMEOUT = 10
+    # Per-process cache of user rows for get_current_user (0 size disables it)
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 30
+    # Failed logins allowed per bucket as (burst, seconds to refill it); successful
+    # logins hand their token back. 'sqlite' shares the buckets across workers via
+    # RATE_LIMIT_SQLITE_PATH (default instance/ratelimit.sqlite3).
+    LOGIN_RATE_LIMITS = {'username': (5, 300), 'ip': (50, 300)}
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    # Sessions are stored server-side in user_session; the cookie only holds a signed id.
+    # A session expires this long after its last renewal, and requests renew it at
+    # most once per SESSION_RENEW_INTERVAL seconds.
+    PERMANENT_SESSION_LIFETIME = timedelta(days=14)
+    SESSION_RENEW_INTERVAL = 300
+    # Per-process cache of session rows; a revocation can take this long to reach other workers
+    SESSION_CACHE_SIZE = 1024
+    SESSION_CACHE_TTL = 30
+    # Background purge of expired rows (0 interval disables it)
+    SESSION_SWEEP_INTERVAL = 600
+    SESSION_SWEEP_BATCH_SIZE = 500
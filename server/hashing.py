@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from instrumentation import record_timing
+
+# Cost parameters used when there is no app context (e.g. in a shell script).
+# Apps override any of these through app.config.
+DEFAULTS = {
+    'PASSWORD_HASHER': 'pbkdf2',
+    'PBKDF2_ITERATIONS': 260000,
+    'BCRYPT_LOG_ROUNDS': 12,
+    'SCRYPT_N': 2 ** 15,
+    'SCRYPT_R': 8,
+    'SCRYPT_P': 1,
+    'HASHING_POOL_WORKERS': os.cpu_count() or 1,
+    'HASHING_POOL_MAX_PENDING': 32,
+    'HASHING_TIMEOUT': 10,
+}
+
+HASHERS = {}
+
+
+def register_hasher(cls):
+    HASHERS[cls.name] = cls
+    return cls
+
+
+def get_config(key):
+    if has_app_context():
+        return current_app.config.get(key, DEFAULTS[key])
+    return DEFAULTS[key]
+
+
+@register_hasher
+class PBKDF2Hasher:
+    '''Werkzeug's pbkdf2:sha256 format, e.g. pbkdf2:sha256:260000$salt$hash.'''
+
+    name = 'pbkdf2'
+
+    def __init__(self):
+        self.iterations = int(get_config('PBKDF2_ITERATIONS'))
+
+    @staticmethod
+    def identify(hashed):
+        return hashed.startswith('pbkdf2:')
+
+    def hash(self, password):
+        return generate_password_hash(password, method=f'pbkdf2:sha256:{self.iterations}')
+
+    def verify(self, password, hashed):
+        return check_password_hash(hashed, password)
+
+    def needs_rehash(self, hashed):
+        method = hashed.split('$', 1)[0].split(':')
+        return method[1:2] != ['sha256'] or method[2:3] != [str(self.iterations)]
+
+
+@register_hasher
+class BcryptHasher:
+    '''Modular crypt bcrypt hashes, e.g. $2b$12$...; BCRYPT_LOG_ROUNDS is the same key flask_bcrypt reads.'''
+
+    name = 'bcrypt'
+
+    def __init__(self):
+        self.rounds = int(get_config('BCRYPT_LOG_ROUNDS'))
+
+    @staticmethod
+    def identify(hashed):
+        return hashed.startswith('$2')
+
+    @staticmethod
+    def _encode(password):
+        # bcrypt only looks at the first 72 bytes; newer releases raise instead of truncating
+        return password.encode('utf-8')[:72]
+
+    def hash(self, password):
+        return bcrypt.hashpw(self._encode(password), bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def verify(self, password, hashed):
+        try:
+            return bcrypt.checkpw(self._encode(password), hashed.encode('utf-8'))
+        except ValueError:
+            return False
+
+    def needs_rehash(self, hashed):
+        return hashed.split('$')[2] != f'{self.rounds:02d}'
+
+
+@register_hasher
+class ScryptHasher:
+    '''hashlib scrypt in werkzeug's format, e.g. scrypt:32768:8:1$salt$hash.'''
+
+    name = 'scrypt'
+
+    def __init__(self):
+        self.n = int(get_config('SCRYPT_N'))
+        self.r = int(get_config('SCRYPT_R'))
+        self.p = int(get_config('SCRYPT_P'))
+
+    @staticmethod
+    def identify(hashed):
+        return hashed.startswith('scrypt:')
+
+    @staticmethod
+    def _derive(password, salt, n, r, p):
+        return hashlib.scrypt(
+            password.encode('utf-8'), salt=salt.encode('utf-8'),
+            n=n, r=r, p=p, maxmem=132 * n * r * p,
+        ).hex()
+
+    def hash(self, password):
+        salt = secrets.token_urlsafe(12)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f'scrypt:{self.n}:{self.r}:{self.p}${salt}${digest}'
+
+    def verify(self, password, hashed):
+        try:
+            method, salt, digest = hashed.split('$', 2)
+            n, r, p = (int(v) for v in method.split(':')[1:])
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._derive(password, salt, n, r, p), digest)
+
+    def needs_rehash(self, hashed):
+        return hashed.split('$', 1)[0] != f'scrypt:{self.n}:{self.r}:{self.p}'
+
+
+def get_hasher(name=None):
+    name = name or get_config('PASSWORD_HASHER')
+    try:
+        return HASHERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown password hasher: {name}")
+
+
+def identify_hasher(hashed):
+    for cls in HASHERS.values():
+        if cls.identify(hashed):
+            return cls()
+    return None
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+
+def verify_password(password, hashed):
+    hasher = identify_hasher(hashed or '')
+    return hasher is not None and hasher.verify(password, hashed)
+
+
+def needs_rehash(hashed):
+    '''True if the hash was made by a different hasher or with different cost parameters than configured.'''
+    hasher = get_hasher()
+    return not hasher.identify(hashed) or hasher.needs_rehash(hashed)
+
+
+def verify_and_rehash(password, hashed):
+    '''Return (verified, new_hash), where new_hash is None unless the stored hash is outdated.
+
+    Works on the hash string alone, so callers can release their database
+    connection before handing it to the hashing pool.
+    '''
+    if not verify_password(password, hashed):
+        return False, None
+    return True, hash_password(password) if needs_rehash(hashed) else None
+
+
+class HashingUnavailable(Exception):
+    '''Raised when the hashing pool is saturated or a job took longer than HASHING_TIMEOUT.'''
+
+
+class HashingPool:
+    '''Bounded thread pool for password hashing.
+
+    pbkdf2, scrypt and bcrypt all release the GIL, so threads are enough to keep
+    KDF work off the request threads. At most workers + max_pending jobs are
+    admitted; anything beyond that is rejected immediately instead of queueing.
+    '''
+
+    def __init__(self, workers, max_pending, timeout):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.timeout = timeout
+
+    def submit(self, fn, *args):
+        '''Queue fn(*args) in an app context and return its concurrent.futures.Future.'''
+        if not self.slots.acquire(blocking=False):
+            raise HashingUnavailable("Hashing pool is saturated")
+
+        # Hashers read their cost settings from the app config
+        app = current_app._get_current_object()
+
+        def job():
+            with app.app_context():
+                return fn(*args)
+
+        try:
+            future = self.executor.submit(job)
+        except RuntimeError:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda f: self.slots.release())
+        return future
+
+    def run(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingUnavailable("Hashing timed out")
+        finally:
+            record_timing('hash', time.perf_counter() - start)
+
+    async def run_async(self, fn, *args):
+        '''Like run(), but awaits the result so the event loop stays free meanwhile.'''
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit(fn, *args)), self.timeout)
+        except asyncio.TimeoutError:
+            raise HashingUnavailable("Hashing timed out")
+        finally:
+            record_timing('hash', time.perf_counter() - start)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def init_hashing_pool(app):
+    app.extensions['hashing_pool'] = HashingPool(
+        workers=app.config.get('HASHING_POOL_WORKERS', DEFAULTS['HASHING_POOL_WORKERS']),
+        max_pending=app.config.get('HASHING_POOL_MAX_PENDING', DEFAULTS['HASHING_POOL_MAX_PENDING']),
+        timeout=app.config.get('HASHING_TIMEOUT', DEFAULTS['HASHING_TIMEOUT']),
+    )
+
+
+def run_hashing(fn, *args):
+    '''Run a hashing call (e.g. user.set_password) on the app's hashing pool and return its result.'''
+    return current_app.extensions['hashing_pool'].run(fn, *args)
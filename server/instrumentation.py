@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from pooling import render_pool_metrics, watch_pool
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metrics:
+    '''Per-endpoint request, database and hashing totals, rendered in Prometheus text format.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.db_seconds = defaultdict(float)
+        self.queries = defaultdict(int)
+        self.hash_seconds = defaultdict(float)
+        self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+
+    def observe(self, endpoint, method, status, timings):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.seconds[endpoint] += timings['app']
+            self.db_seconds[endpoint] += timings['db']
+            self.queries[endpoint] += timings['queries']
+            self.hash_seconds[endpoint] += timings['hash']
+            counts = self.buckets[endpoint]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if timings['app'] <= bound:
+                    counts[i] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP http_requests_total Requests handled, by endpoint, method and status.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            totals = defaultdict(int)
+            for (endpoint, _, _), count in self.requests.items():
+                totals[endpoint] += count
+
+            lines += [
+                '# HELP http_request_duration_seconds Wall time spent handling requests.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for endpoint, counts in sorted(self.buckets.items()):
+                for bound, count in zip(DURATION_BUCKETS, counts):
+                    lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {totals[endpoint]}')
+                lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {self.seconds[endpoint]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {totals[endpoint]}')
+
+            for name, kind, help_text, values in (
+                ('db_query_duration_seconds_total', 'counter', 'Time spent executing SQL.', self.db_seconds),
+                ('db_queries_total', 'counter', 'SQL statements executed.', self.queries),
+                ('password_hash_duration_seconds_total', 'counter', 'Time spent hashing or verifying passwords.', self.hash_seconds),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for endpoint, value in sorted(values.items()):
+                    formatted = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {formatted}')
+        return '\n'.join(lines) + '\n'
+
+
+def record_timing(name, seconds):
+    '''Add time to a named bucket ('db', 'hash') of the current request, if it is being timed.'''
+    if has_request_context() and 'timings' in g:
+        g.timings[name] += seconds
+
+
+def start_request_timer():
+    if current_app.config.get('INSTRUMENTATION_ENABLED'):
+        g.timings = {'start': time.perf_counter(), 'db': 0.0, 'hash': 0.0, 'queries': 0}
+
+
+def finish_request_timer(response):
+    timings = g.pop('timings', None)
+    if timings is None:
+        return response
+
+    # Work done while streaming a response body happens after this hook and is not counted
+    timings['app'] = time.perf_counter() - timings.pop('start')
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    current_app.extensions['metrics'].observe(endpoint, request.method, response.status_code, timings)
+
+    response.headers.add(
+        'Server-Timing',
+        f'app;dur={timings["app"] * 1000:.2f}, '
+        f'db;dur={timings["db"] * 1000:.2f};desc="{timings["queries"]} queries", '
+        f'hash;dur={timings["hash"] * 1000:.2f}',
+    )
+    return response
+
+
+def metrics_view():
+    if not current_app.config.get('INSTRUMENTATION_ENABLED'):
+        abort(404)
+    pool_lines = render_pool_metrics(current_app.extensions.get('db_pools', {}))
+    return Response(
+        current_app.extensions['metrics'].render() + ''.join(line + '\n' for line in pool_lines),
+        mimetype='text/plain; version=0.0.4',
+    )
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context() and 'timings' in g:
+            g.timings['db'] += elapsed
+            g.timings['queries'] += 1
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_start'):
+            connection.info['query_start'].pop()
+
+
+def init_instrumentation(app, db):
+    '''Register the timing hooks and /metrics; nothing is recorded unless INSTRUMENTATION_ENABLED is set.'''
+    app.extensions['metrics'] = Metrics()
+    app.before_request(start_request_timer)
+    app.after_request(finish_request_timer)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+            watch_pool(app, 'primary', engine)
@@ -0,0 +1,52 @@
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib json module is used without it
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    '''Compact JSON, encoded with orjson when it is installed and JSON_BACKEND is 'orjson'.
+
+    Output matches the default provider apart from whitespace, key order and
+    non-ASCII characters, which orjson writes as UTF-8 instead of \\u escapes.
+    Anything orjson refuses (e.g. integers wider than 64 bits) falls back to the
+    stdlib encoder.
+    '''
+
+    compact = True
+    # Sorting keys costs time on every object and clients don't rely on the order
+    sort_keys = False
+
+    def use_orjson(self):
+        return orjson is not None and self._app.config.get('JSON_BACKEND', 'orjson') == 'orjson'
+
+    def dumps_bytes(self, obj):
+        if self.use_orjson():
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                # Dates go through Flask's default hook so they keep the HTTP date format
+                return orjson.dumps(obj, default=_default, option=option)
+            except TypeError:
+                pass
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs or kwargs == {'separators': (',', ':')}:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if not kwargs and self.use_orjson():
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
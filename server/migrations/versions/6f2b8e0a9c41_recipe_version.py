@@ -0,0 +1,27 @@
+"""Add recipe version for optimistic locking
+
+Revision ID: 6f2b8e0a9c41
+Revises: 3a9e5d7c2f18
+Create Date: 2026-10-18 15:22:37.902614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2b8e0a9c41'
+down_revision = '3a9e5d7c2f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A plain ADD COLUMN rather than a batch table rebuild, which would drop the
+    # recipe_fts triggers along with the old table
+    op.add_column('recipe', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    # SQLite 3.35+ can drop a column in place, again keeping the triggers
+    op.drop_column('recipe', 'version')
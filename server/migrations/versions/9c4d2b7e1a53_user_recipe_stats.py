@@ -0,0 +1,56 @@
+"""User recipe stats
+
+Revision ID: 9c4d2b7e1a53
+Revises: 6f2b8e0a9c41
+Create Date: 2026-10-18 17:48:05.331270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2b7e1a53'
+down_revision = '6f2b8e0a9c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('recipe_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('user', sa.Column('total_minutes', sa.Integer(), server_default='0', nullable=False))
+    # Aggregates for the recipes that already exist
+    op.execute(
+        "UPDATE user SET "
+        "recipe_count = (SELECT count(*) FROM recipe WHERE recipe.user_id = user.id), "
+        "total_minutes = (SELECT coalesce(sum(minutes_to_complete), 0) FROM recipe WHERE recipe.user_id = user.id)"
+    )
+    # Kept in step with recipe by triggers; the statements match stats.STATS_TRIGGERS
+    op.execute(
+        "CREATE TRIGGER recipe_stats_ai AFTER INSERT ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count + 1, "
+        "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_stats_ad AFTER DELETE ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count - 1, "
+        "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_stats_au AFTER UPDATE OF user_id, minutes_to_complete ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count - 1, "
+        "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+        "UPDATE user SET recipe_count = recipe_count + 1, "
+        "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+        "END"
+    )
+
+
+def downgrade():
+    op.execute("DROP TRIGGER recipe_stats_au")
+    op.execute("DROP TRIGGER recipe_stats_ad")
+    op.execute("DROP TRIGGER recipe_stats_ai")
+    op.drop_column('user', 'total_minutes')
+    op.drop_column('user', 'recipe_count')
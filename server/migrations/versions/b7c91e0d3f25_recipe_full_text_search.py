@@ -0,0 +1,50 @@
+"""Recipe full-text search
+
+Revision ID: b7c91e0d3f25
+Revises: 8e2d4a61f0b3
+Create Date: 2026-10-18 11:26:03.207719
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c91e0d3f25'
+down_revision = '8e2d4a61f0b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # External-content FTS5 index kept in sync with recipe by triggers
+    op.execute(
+        "CREATE VIRTUAL TABLE recipe_fts USING fts5("
+        "title, instructions, content='recipe', content_rowid='id', tokenize='porter unicode61')"
+    )
+    op.execute("INSERT INTO recipe_fts(recipe_fts, rank) VALUES('rank', 'bm25(10.0, 1.0)')")
+    op.execute(
+        "CREATE TRIGGER recipe_fts_ai AFTER INSERT ON recipe BEGIN "
+        "INSERT INTO recipe_fts(rowid, title, instructions) VALUES (new.id, new.title, new.instructions); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_fts_ad AFTER DELETE ON recipe BEGIN "
+        "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions) VALUES ('delete', old.id, old.title, old.instructions); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_fts_au AFTER UPDATE OF title, instructions ON recipe BEGIN "
+        "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions) VALUES ('delete', old.id, old.title, old.instructions); "
+        "INSERT INTO recipe_fts(rowid, title, instructions) VALUES (new.id, new.title, new.instructions); "
+        "END"
+    )
+    # Index the recipes that already exist
+    op.execute("INSERT INTO recipe_fts(recipe_fts) VALUES('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER recipe_fts_au")
+    op.execute("DROP TRIGGER recipe_fts_ad")
+    op.execute("DROP TRIGGER recipe_fts_ai")
+    op.execute("DROP TABLE recipe_fts")
@@ -0,0 +1,86 @@
+"""Recipe search scoped by owner
+
+Revision ID: e41b7c9d2a60
+Revises: 9c4d2b7e1a53
+Create Date: 2026-10-18 20:12:44.618093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b7c9d2a60'
+down_revision = '9c4d2b7e1a53'
+branch_labels = None
+depends_on = None
+
+
+def drop_index():
+    op.execute("DROP TRIGGER recipe_fts_au")
+    op.execute("DROP TRIGGER recipe_fts_ad")
+    op.execute("DROP TRIGGER recipe_fts_ai")
+    op.execute("DROP TABLE recipe_fts")
+
+
+def upgrade():
+    drop_index()
+    # The owner column holds a "u<user id>" token that searches AND into the MATCH
+    op.execute(
+        "CREATE VIEW recipe_search_source AS "
+        "SELECT id, title, instructions, 'u' || user_id AS owner FROM recipe"
+    )
+    op.execute(
+        "CREATE VIRTUAL TABLE recipe_fts USING fts5("
+        "title, instructions, owner, content='recipe_search_source', content_rowid='id', "
+        "tokenize='porter unicode61', prefix='1 2 3')"
+    )
+    op.execute("INSERT INTO recipe_fts(recipe_fts, rank) VALUES('rank', 'bm25(10.0, 1.0, 0.0)')")
+    op.execute(
+        "CREATE TRIGGER recipe_fts_ai AFTER INSERT ON recipe BEGIN "
+        "INSERT INTO recipe_fts(rowid, title, instructions, owner) "
+        "VALUES (new.id, new.title, new.instructions, 'u' || new.user_id); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_fts_ad AFTER DELETE ON recipe BEGIN "
+        "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions, owner) "
+        "VALUES ('delete', old.id, old.title, old.instructions, 'u' || old.user_id); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_fts_au AFTER UPDATE OF title, instructions, user_id ON recipe BEGIN "
+        "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions, owner) "
+        "VALUES ('delete', old.id, old.title, old.instructions, 'u' || old.user_id); "
+        "INSERT INTO recipe_fts(rowid, title, instructions, owner) "
+        "VALUES (new.id, new.title, new.instructions, 'u' || new.user_id); "
+        "END"
+    )
+    op.execute("INSERT INTO recipe_fts(recipe_fts) VALUES('rebuild')")
+
+
+def downgrade():
+    drop_index()
+    op.execute("DROP VIEW recipe_search_source")
+    op.execute(
+        "CREATE VIRTUAL TABLE recipe_fts USING fts5("
+        "title, instructions, content='recipe', content_rowid='id', tokenize='porter unicode61')"
+    )
+    op.execute("INSERT INTO recipe_fts(recipe_fts, rank) VALUES('rank', 'bm25(10.0, 1.0)')")
+    op.execute(
+        "CREATE TRIGGER recipe_fts_ai AFTER INSERT ON recipe BEGIN "
+        "INSERT INTO recipe_fts(rowid, title, instructions) VALUES (new.id, new.title, new.instructions); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_fts_ad AFTER DELETE ON recipe BEGIN "
+        "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions) VALUES ('delete', old.id, old.title, old.instructions); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_fts_au AFTER UPDATE OF title, instructions ON recipe BEGIN "
+        "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions) VALUES ('delete', old.id, old.title, old.instructions); "
+        "INSERT INTO recipe_fts(rowid, title, instructions) VALUES (new.id, new.title, new.instructions); "
+        "END"
+    )
+    op.execute("INSERT INTO recipe_fts(recipe_fts) VALUES('rebuild')")
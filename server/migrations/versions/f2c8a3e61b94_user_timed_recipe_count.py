@@ -0,0 +1,84 @@
+"""User timed recipe count
+
+Revision ID: f2c8a3e61b94
+Revises: e41b7c9d2a60
+Create Date: 2026-10-18 22:05:37.140562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8a3e61b94'
+down_revision = 'e41b7c9d2a60'
+branch_labels = None
+depends_on = None
+
+STATS_DROP = [
+    "DROP TRIGGER recipe_stats_au",
+    "DROP TRIGGER recipe_stats_ad",
+    "DROP TRIGGER recipe_stats_ai",
+]
+
+
+def upgrade():
+    op.add_column('user', sa.Column('timed_recipe_count', sa.Integer(), server_default='0', nullable=False))
+    # Recipes without minutes_to_complete don't count towards the average
+    op.execute(
+        "UPDATE user SET timed_recipe_count = "
+        "(SELECT count(minutes_to_complete) FROM recipe WHERE recipe.user_id = user.id)"
+    )
+    for statement in STATS_DROP:
+        op.execute(statement)
+    # The statements match stats.STATS_TRIGGERS
+    op.execute(
+        "CREATE TRIGGER recipe_stats_ai AFTER INSERT ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count + 1, "
+        "timed_recipe_count = timed_recipe_count + (new.minutes_to_complete IS NOT NULL), "
+        "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_stats_ad AFTER DELETE ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count - 1, "
+        "timed_recipe_count = timed_recipe_count - (old.minutes_to_complete IS NOT NULL), "
+        "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_stats_au AFTER UPDATE OF user_id, minutes_to_complete ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count - 1, "
+        "timed_recipe_count = timed_recipe_count - (old.minutes_to_complete IS NOT NULL), "
+        "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+        "UPDATE user SET recipe_count = recipe_count + 1, "
+        "timed_recipe_count = timed_recipe_count + (new.minutes_to_complete IS NOT NULL), "
+        "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+        "END"
+    )
+
+
+def downgrade():
+    for statement in STATS_DROP:
+        op.execute(statement)
+    op.execute(
+        "CREATE TRIGGER recipe_stats_ai AFTER INSERT ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count + 1, "
+        "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_stats_ad AFTER DELETE ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count - 1, "
+        "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER recipe_stats_au AFTER UPDATE OF user_id, minutes_to_complete ON recipe BEGIN "
+        "UPDATE user SET recipe_count = recipe_count - 1, "
+        "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+        "UPDATE user SET recipe_count = recipe_count + 1, "
+        "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+        "END"
+    )
+    op.drop_column('user', 'timed_recipe_count')
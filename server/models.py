@@ -1,9 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, object_session
+from sqlalchemy import event, func, inspect, select, update
 
-db = SQLAlchemy()
+from hashing import hash_password, verify_and_rehash
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Ensure this URL matches what the test is expecting
 DEFAULT_IMAGE_URL = "https://cdn.pixabay.com/photo/2017/11/10/05/24/screenshot_4.jpg"
@@ -14,6 +17,14 @@ class User(db.Model):
     _password_hash = db.Column(db.String(255), nullable=False)
     bio = db.Column(db.Text, default="")
     image_url = db.Column(db.String(255), default=DEFAULT_IMAGE_URL)
+    # Bumped whenever the user or any of their recipes change; drives ETags
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    data_modified_at = db.Column(db.DateTime, default=func.current_timestamp())
+    # Aggregates over the user's recipes, maintained by triggers on recipe (see stats.py)
+    recipe_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Recipes with a minutes_to_complete; the average ignores the rest, like SQL AVG
+    timed_recipe_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_minutes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Use lazy='dynamic'
     recipes = db.relationship('Recipe', backref='user', lazy='dynamic', cascade='all, delete-orphan')
@@ -29,31 +40,66 @@ class User(db.Model):
 
     @password_hash.setter
     def password_hash(self, password):
-        self._password_hash = generate_password_hash(password)
+        self._password_hash = hash_password(password)
 
     def set_password(self, password):
         self.password_hash = password
 
     def authenticate(self, password):
-        return check_password_hash(self._password_hash, password)
+        verified, new_hash = verify_and_rehash(password, self._password_hash)
+        # Upgrade hashes made with an old hasher or cost while we have the plaintext;
+        # the caller is responsible for committing the change.
+        if new_hash:
+            self._password_hash = new_hash
+        return verified
+
+    @property
+    def average_minutes(self):
+        return self.total_minutes / self.timed_recipe_count if self.timed_recipe_count else None
 
     # ... (to_dict method)
-    def to_dict(self):
-        return {
+    def to_dict(self, include_recipes=True):
+        data = {
             "id": self.id,
             "username": self.username,
             "bio": self.bio,
             "image_url": self.image_url,
-            # Use .all() here for the dict to match expected output in tests
-            "recipes": [r.to_dict() for r in self.recipes.all()] 
         }
+        if include_recipes:
+            # Only the serialized columns are selected; no Recipe instances are built
+            rows = db.session.execute(
+                select(*Recipe.serialized_columns())
+                .where(Recipe.user_id == self.id)
+                .order_by(Recipe.id)
+            )
+            data["recipes"] = [row._asdict() for row in rows]
+        else:
+            # Summary form for hot endpoints: stored aggregates, no recipe rows read
+            data["recipe_count"] = self.recipe_count
+            data["total_minutes"] = self.total_minutes
+            data["average_minutes"] = self.average_minutes
+        return data
 
 class Recipe(db.Model):
+    # (user_id, id) serves both the per-user lookups and the keyset pagination
+    # ORDER BY id without a separate sort step; (minutes_to_complete, id, user_id)
+    # does the same for the feed's duration filters and quickest-first order, and
+    # carries user_id so author filters are checked without reading the row
+    __table_args__ = (
+        db.Index('ix_recipe_user_id_id', 'user_id', 'id'),
+        db.Index('ix_recipe_minutes_to_complete_id_user_id', 'minutes_to_complete', 'id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     instructions = db.Column(db.Text, nullable=False)
     minutes_to_complete = db.Column(db.Integer)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Optimistic locking: every ORM UPDATE/DELETE matches on the version it loaded
+    # and bumps it, raising StaleDataError if another writer got there first
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
     # ... (validation and to_dict methods)
     @validates('title')
@@ -64,7 +110,7 @@ class Recipe(db.Model):
 
     @validates('instructions')
     def validate_instructions(self, key, instructions):
-        if len(instructions) < 50:
+        if not instructions or len(instructions) < 50:
             raise ValueError("Instructions must be at least 50 characters long.")
         return instructions
 
@@ -74,11 +120,67 @@ class Recipe(db.Model):
             raise ValueError("Minutes to complete must be a positive number.")
         return minutes
 
+    # Keys of to_dict(); read paths select exactly these columns (see serialized_columns)
+    serialize_fields = ("id", "title", "instructions", "minutes_to_complete", "user_id", "version")
+
+    @classmethod
+    def serialized_columns(cls):
+        return [getattr(cls, field) for field in cls.serialize_fields]
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "title": self.title,
-            "instructions": self.instructions,
-            "minutes_to_complete": self.minutes_to_complete,
-            "user_id": self.user_id
-        }
\ No newline at end of file
+        return {field: getattr(self, field) for field in self.serialize_fields}
+
+class UserSession(db.Model):
+    '''Server-side state behind a session cookie; see sessions.py.'''
+    __tablename__ = 'user_session'
+
+    id = db.Column(db.String(64), primary_key=True)
+    # No foreign key: a session may outlive its user, and revoking a user's
+    # sessions is a DELETE on this index rather than a cascade
+    user_id = db.Column(db.Integer, index=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+# -----------------------
+# Per-user data version
+# -----------------------
+def bump_data_version(connection, *user_ids):
+    connection.execute(
+        update(User.__table__)
+        .where(User.__table__.c.id.in_([i for i in user_ids if i is not None]))
+        .values(
+            data_version=User.__table__.c.data_version + 1,
+            data_modified_at=func.current_timestamp(),
+        )
+    )
+
+@event.listens_for(User, 'before_update')
+def bump_user_data_version(mapper, connection, target):
+    if object_session(target).is_modified(target, include_collections=False):
+        # SQL expressions keep the bump correct even if this instance holds a stale version
+        target.data_version = User.data_version + 1
+        target.data_modified_at = func.current_timestamp()
+
+@event.listens_for(Recipe, 'after_insert')
+@event.listens_for(Recipe, 'after_delete')
+def bump_owner_data_version(mapper, connection, target):
+    bump_data_version(connection, target.user_id)
+
+@event.listens_for(Recipe, 'after_update')
+def bump_owners_data_version(mapper, connection, target):
+    # A recipe that moved to another user changes both users' data
+    previous = inspect(target).attrs.user_id.history.deleted
+    bump_data_version(connection, target.user_id, *previous)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def bump_on_bulk_recipe_changes(orm_execute_state):
+    # Query.update()/delete() skip the mapper events and we can't tell whose rows
+    # they touched, so every user's version moves
+    if orm_execute_state.is_delete or orm_execute_state.is_update:
+        if any(mapper.class_ is Recipe for mapper in orm_execute_state.all_mappers):
+            orm_execute_state.session.execute(
+                update(User.__table__).values(
+                    data_version=User.__table__.c.data_version + 1,
+                    data_modified_at=func.current_timestamp(),
+                )
+            )
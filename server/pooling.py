@@ -0,0 +1,177 @@
+'''Connection pool settings and pool metrics.
+
+The DB_POOL_* settings become SQLALCHEMY_ENGINE_OPTIONS, which the primary,
+replica and session store engines are all created with. A setting left at None
+keeps SQLAlchemy's default. Anything set in SQLALCHEMY_ENGINE_OPTIONS itself
+overrides the matching DB_POOL_* setting.
+
+    DB_POOL_CLASS         'queue', 'null', 'static' or 'singleton'; None picks the
+                          dialect's default (QueuePool for a SQLite file)
+    DB_POOL_SIZE          connections kept open (QueuePool)
+    DB_POOL_MAX_OVERFLOW  extra connections opened under load and closed again
+                          when returned (QueuePool)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection before failing (QueuePool)
+    DB_POOL_RECYCLE       replace connections older than this many seconds
+    DB_POOL_PRE_PING      test each connection with a round trip on checkout
+
+Every pool also counts checkouts, the time spent waiting for a connection, how
+long connections are held, and new or invalidated connections. That costs two
+clock reads per checkout. The counters appear in /metrics when
+INSTRUMENTATION_ENABLED is set. Churn shows up as opened connections growing
+along with checkouts.
+'''
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+POOL_CLASSES = {
+    'queue': QueuePool,
+    'null': NullPool,
+    'static': StaticPool,
+    'singleton': SingletonThreadPool,
+}
+
+# DB_POOL_* setting -> create_engine() argument, for every pool class and for QueuePool only
+POOL_OPTIONS = {'DB_POOL_RECYCLE': 'pool_recycle', 'DB_POOL_PRE_PING': 'pool_pre_ping'}
+QUEUE_POOL_OPTIONS = {'DB_POOL_SIZE': 'pool_size', 'DB_POOL_MAX_OVERFLOW': 'max_overflow',
+                      'DB_POOL_TIMEOUT': 'pool_timeout'}
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0
+        self.timeouts = 0
+        self.opened = 0
+        self.invalidated = 0
+
+    def observe_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def observe_checkin(self, held):
+        with self._lock:
+            self.checkins += 1
+            self.hold_seconds += held
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class TimedPoolMixin:
+    '''Times Pool._do_get, which returns a pooled connection, waiting or connecting first if needed.'''
+
+    stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.observe_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.observe_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+_timed_classes = {}
+
+
+def timed_pool_class(pool_class):
+    if pool_class not in _timed_classes:
+        _timed_classes[pool_class] = type(f'Timed{pool_class.__name__}', (TimedPoolMixin, pool_class), {})
+    return _timed_classes[pool_class]
+
+
+def engine_options(config):
+    '''create_engine() keyword arguments for the DB_POOL_* settings in config.'''
+    name = config.get('DB_POOL_CLASS')
+    if name:
+        try:
+            pool_class = POOL_CLASSES[name]
+        except KeyError:
+            raise ValueError(f"Unknown DB_POOL_CLASS: {name}")
+    else:
+        url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+        pool_class = url.get_dialect().get_pool_class(url)
+
+    settings = dict(POOL_OPTIONS)
+    if issubclass(pool_class, QueuePool):
+        settings.update(QUEUE_POOL_OPTIONS)
+    options = {arg: config[key] for key, arg in settings.items() if config.get(key) is not None}
+    options['poolclass'] = timed_pool_class(pool_class)
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    return options
+
+
+def watch_pool(app, name, engine):
+    '''Collect metrics for engine's pool under the given name, if it is a timed pool.'''
+    if not isinstance(engine.pool, TimedPoolMixin):
+        return
+    stats = engine.pool.stats = PoolStats()
+    app.extensions.setdefault('db_pools', {})[name] = stats
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        stats.count('opened')
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+
+    @event.listens_for(engine, 'checkin')
+    def checkin(dbapi_connection, connection_record):
+        start = connection_record.info.pop('checked_out_at', None)
+        if start is not None:
+            stats.observe_checkin(time.perf_counter() - start)
+
+    @event.listens_for(engine, 'invalidate')
+    def invalidate(dbapi_connection, connection_record, exception):
+        stats.count('invalidated')
+
+
+def render_pool_metrics(pools):
+    '''Prometheus text lines for the PoolStats in pools, keyed by pool name.'''
+    lines = []
+    for name, kind, help_text, read in (
+        ('db_pool_checkouts_total', 'counter', 'Connections handed out by the pool.', lambda s: s.checkouts),
+        ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for (or opening) a connection.', lambda s: s.wait_seconds),
+        ('db_pool_wait_seconds_max', 'gauge', 'Longest single wait for a connection.', lambda s: s.max_wait_seconds),
+        ('db_pool_checkout_seconds_total', 'counter', 'Time connections spent checked out.', lambda s: s.hold_seconds),
+        ('db_pool_connections_in_use', 'gauge', 'Connections currently checked out.', lambda s: s.checkouts - s.checkins),
+        ('db_pool_timeouts_total', 'counter', 'Checkouts that gave up after DB_POOL_TIMEOUT.', lambda s: s.timeouts),
+        ('db_pool_connections_opened_total', 'counter', 'New database connections opened.', lambda s: s.opened),
+        ('db_pool_connections_invalidated_total', 'counter', 'Connections discarded as broken or stale.', lambda s: s.invalidated),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for pool, stats in sorted(pools.items()):
+            value = read(stats)
+            formatted = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{name}{{pool="{pool}"}} {formatted}')
+    return lines
+
+
+def init_pooling(app):
+    '''Turn the DB_POOL_* settings into SQLALCHEMY_ENGINE_OPTIONS; call before db.init_app().'''
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
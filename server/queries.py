@@ -0,0 +1,88 @@
+from sqlalchemy import select, tuple_
+
+from models import db, Recipe
+from search import build_match_query, recipe_fts
+
+# Read-path queries for the list endpoints. They select exactly the columns in
+# Recipe.serialize_fields and hand back RecipeRecords, so a page of results costs
+# one tuple per row instead of a full ORM instance with identity-map entry,
+# attribute state and validators.
+
+
+class RecipeRecord:
+    '''Read-only view of one serialized recipe row.'''
+
+    __slots__ = Recipe.serialize_fields
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def recipe_columns():
+    return select(*Recipe.serialized_columns())
+
+
+def fetch_records(statement, yield_per=None):
+    '''Run a recipe_columns() statement and return its RecipeRecords.
+
+    With yield_per the rows are fetched lazily in batches of that size and a
+    generator is returned; otherwise the whole result is read into a list.
+    '''
+    if yield_per:
+        result = db.session.execute(statement.execution_options(yield_per=yield_per))
+        return (RecipeRecord(row) for row in result)
+    return [RecipeRecord(row) for row in db.session.execute(statement)]
+
+
+def user_recipes_query(user_id, after=None):
+    query = recipe_columns().where(Recipe.user_id == user_id).order_by(Recipe.id)
+    if after is not None:
+        query = query.where(Recipe.id > after)
+    return query
+
+
+def feed_query(sort, limit, cursor=None, min_minutes=None, max_minutes=None, author_id=None):
+    '''One page of the public feed: at most limit recipes after the keyset cursor.
+
+    The page's ids are picked by a subquery that reads only id, user_id and
+    minutes_to_complete, so it runs on the (minutes_to_complete, id, user_id) or
+    (user_id, id) covering index. The table itself is read for just those rows.
+    '''
+    page = select(Recipe.id)
+    if min_minutes is not None:
+        page = page.where(Recipe.minutes_to_complete >= min_minutes)
+    if max_minutes is not None:
+        page = page.where(Recipe.minutes_to_complete <= max_minutes)
+    if author_id is not None:
+        page = page.where(Recipe.user_id == author_id)
+
+    if sort == 'quickest':
+        # Recipes without a duration can't be ranked by it
+        page = page.where(Recipe.minutes_to_complete.isnot(None))
+        if cursor is not None:
+            page = page.where(tuple_(Recipe.minutes_to_complete, Recipe.id) > tuple_(*cursor))
+        order = (Recipe.minutes_to_complete, Recipe.id)
+    else:
+        if cursor is not None:
+            page = page.where(Recipe.id < cursor)
+        order = (Recipe.id.desc(),)
+
+    page = page.order_by(*order).limit(limit).subquery()
+    return recipe_columns().join(page, Recipe.id == page.c.id).order_by(*order)
+
+
+def search_query(user_id, q):
+    '''The user's recipes matching q, most relevant first.
+
+    The MATCH itself is limited to the user's recipes (see search.py), so only
+    they are ranked. The user_id condition just guards against a stale index row.
+    '''
+    return recipe_columns() \
+        .join(recipe_fts, recipe_fts.c.rowid == Recipe.id) \
+        .where(recipe_fts.c.recipe_fts.op('MATCH')(build_match_query(q, user_id))) \
+        .where(Recipe.user_id == user_id) \
+        .order_by(recipe_fts.c.rank)
@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+
+from cache import TTLCache
+
+
+class MemoryBackend:
+    '''Token buckets in a per-process LRU.
+
+    An untouched bucket refills completely after capacity / rate seconds, so
+    entries expire then: dropping them loses nothing, and a flood of distinct
+    keys cannot grow the table past maxsize.
+    '''
+
+    def __init__(self, maxsize=100000, horizon=3600):
+        self.buckets = TTLCache(maxsize=maxsize, ttl=horizon)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets.set(key, (tokens, now))
+            return allowed, tokens
+
+    def give(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated_at = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate + 1)
+            self.buckets.set(key, (tokens, now))
+
+
+class SQLiteBackend:
+    '''Token buckets in a SQLite table shared by every worker process on the host.
+
+    Each update runs in a BEGIN IMMEDIATE transaction, so concurrent workers
+    serialize on the bucket instead of overwriting each other.
+    '''
+
+    # Every this many updates, rows idle past the horizon (and so full again) are purged
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, horizon=3600):
+        self.path = path
+        self.horizon = horizon
+        self._local = threading.local()
+        self._calls = 0
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_bucket ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are started explicitly below
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _update(self, key, capacity, rate, now, delta):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_bucket WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated_at) * rate + max(delta, 0))
+            allowed = delta >= 0 or tokens >= 1
+            if delta < 0 and allowed:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO rate_limit_bucket (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            self._calls += 1
+            if self._calls % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit_bucket WHERE updated_at < ?", (now - self.horizon,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def take(self, key, capacity, rate, now):
+        return self._update(key, capacity, rate, now, -1)
+
+    def give(self, key, capacity, rate, now):
+        self._update(key, capacity, rate, now, 1)
+
+
+class RateLimiter:
+    '''Token-bucket limiter over a pluggable backend.
+
+    rules maps a rule name to (capacity, period): a bucket holds up to capacity
+    tokens and refills at capacity / period tokens per second.
+    '''
+
+    def __init__(self, backend, rules, clock=time.time):
+        self.backend = backend
+        self.rules = rules
+        self.clock = clock
+
+    def hit(self, keys):
+        '''Take a token from each (rule, key) bucket.
+
+        Returns None if every bucket had a token, otherwise the seconds until the
+        emptiest one refills. Tokens already taken for this hit are handed back.
+        '''
+        now = self.clock()
+        taken = []
+        for rule, key in keys:
+            capacity, period = self.rules[rule]
+            rate = capacity / period
+            allowed, tokens = self.backend.take(f'{rule}:{key}', capacity, rate, now)
+            if not allowed:
+                self.refund(taken)
+                return (1 - tokens) / rate
+            taken.append((rule, key))
+        return None
+
+    def refund(self, keys):
+        now = self.clock()
+        for rule, key in keys:
+            capacity, period = self.rules[rule]
+            self.backend.give(f'{rule}:{key}', capacity, capacity / period, now)
+
+
+def init_rate_limiter(app):
+    rules = app.config.get('LOGIN_RATE_LIMITS', {'username': (5, 300), 'ip': (50, 300)})
+    # Long enough for any bucket to refill completely
+    horizon = max(period for _, period in rules.values())
+    backend_name = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    if backend_name == 'sqlite':
+        path = app.config.get('RATE_LIMIT_SQLITE_PATH') or os.path.join(app.instance_path, 'ratelimit.sqlite3')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        backend = SQLiteBackend(path, horizon=horizon)
+    elif backend_name == 'memory':
+        backend = MemoryBackend(horizon=horizon)
+    else:
+        raise ValueError(f"Unknown rate limit backend: {backend_name}")
+    app.extensions['rate_limiter'] = RateLimiter(backend, rules)
+
+
+def get_rate_limiter():
+    return current_app.extensions['rate_limiter']
@@ -0,0 +1,77 @@
+'''Send the reads of GET requests to read replicas, and everything else to the primary.
+
+With SQLALCHEMY_REPLICA_URIS set, db.session picks an engine per statement:
+- Flushes and INSERT/UPDATE/DELETE statements always go to the primary.
+- Other statements in a GET or HEAD request go to the replicas, round robin.
+- Everything outside a request, such as the CLI, migrations and seed.py, uses the primary.
+
+Replicas lag behind the primary. After a request writes, its session reads from
+the primary for REPLICA_STICKY_SECONDS, so clients see their own changes. The
+deadline is stored in the server-side session. Requests without a session have
+nothing to stick to.
+'''
+import itertools
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.sql.dml import UpdateBase
+
+from instrumentation import instrument_engine
+from pooling import watch_pool
+from sqlite_tuning import apply_sqlite_pragmas, get_sqlite_pragmas
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaSet:
+    def __init__(self, engines):
+        self.engines = engines
+        self.counter = itertools.count()
+
+    def choose(self):
+        return self.engines[next(self.counter) % len(self.engines)]
+
+
+class RoutingSession(Session):
+    '''db.session's class: routes reads of replica-eligible requests to a replica engine.'''
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and 'db_replicas' in current_app.extensions:
+            if self._flushing or isinstance(clause, UpdateBase):
+                # Whatever the request reads after writing must come from the primary too
+                g.db_use_replica = False
+                g.db_wrote = True
+            elif g.get('db_use_replica'):
+                return current_app.extensions['db_replicas'].choose()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def route_request():
+    sticky_until = session.get('db_primary_until')
+    g.db_use_replica = request.method in READ_METHODS and not (sticky_until and sticky_until > time.time())
+
+
+def remember_write(response):
+    if g.get('db_wrote'):
+        session['db_primary_until'] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+    return response
+
+
+def init_replicas(app, db):
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        return
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    pragmas = get_sqlite_pragmas(app.config)
+    engines = []
+    for i, uri in enumerate(uris):
+        engine = create_engine(uri, **options)
+        apply_sqlite_pragmas(engine, pragmas)
+        instrument_engine(engine)
+        watch_pool(app, f'replica{i}', engine)
+        engines.append(engine)
+    app.extensions['db_replicas'] = ReplicaSet(engines)
+    app.before_request(route_request)
+    app.after_request(remember_write)
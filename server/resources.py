@@ -1,96 +1,723 @@
-# resources.py
-from flask import request, session
-from flask_restful import Resource
-from models import User, Recipe
-from app import db
+'''The API's request handlers as flask_restful Resources; init_api() registers them on an app.'''
+import json
+import logging
+import math
+import zlib
+from datetime import timezone
 
+from flask import current_app, request, jsonify, session, Response, stream_with_context
+from flask_restful import Api, Resource
+from models import db, User, Recipe, bump_data_version
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError 
+from sqlalchemy.orm.exc import StaleDataError
+from hashing import run_hashing, verify_and_rehash, HashingUnavailable
+from cache import load_user, load_users
+from search import build_match_query
+from queries import RecipeRecord, fetch_records, feed_query, search_query, user_recipes_query
+from ratelimit import get_rate_limiter
+from sessions import revoke_user_sessions
+
+logger = logging.getLogger(__name__)
+
+# -----------------------
+# Helper functions
+# -----------------------
+def get_current_user():
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    user = load_user(user_id)
+    # If a user ID is in session but the user isn't found (e.g., deleted), clear session
+    if not user:
+        session.pop('user_id', None)
+    return user
+
+def user_version_row(user_id):
+    return db.session.execute(
+        select(User.data_version, User.data_modified_at).where(User.id == user_id)
+    ).one_or_none()
+
+def user_data_validators(user_id):
+    '''ETag and Last-Modified for a view of the user's data, read from the user row alone.'''
+    return data_validators(user_id, user_version_row(user_id))
+
+def data_validators(user_id, row):
+    '''ETag and Last-Modified from anything with the user's data_version and data_modified_at.'''
+    if row is None:
+        return None, None
+    # The same data renders differently per path and query string (?include=, ?limit=, ...)
+    variant = zlib.crc32(request.full_path.encode('utf-8'))
+    last_modified = row.data_modified_at.replace(tzinfo=timezone.utc) if row.data_modified_at else None
+    return f'{user_id}-{row.data_version}-{variant:08x}', last_modified
+
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Clients may keep a copy but must revalidate before using it
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified_response(etag, last_modified):
+    return set_validators(Response(status=304), etag, last_modified)
+
+def busy_response():
+    return jsonify({"errors": "Server is busy, please try again"}), 503, {'Retry-After': '1'}
+
+def rate_limited_response(retry_after):
+    return jsonify({"errors": "Too many login attempts, please try again later"}), 429, \
+        {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+def parse_int_arg(name, minimum=0, maximum=None):
+    '''Read an optional integer query parameter, raising ValueError if it is malformed.'''
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"{name} must be at most {maximum}")
+    return value
+
+def check_recipe_text(data):
+    '''Raise ValueError if title or instructions is given but isn't a string.
+
+    The model validators only check lengths, so a number would raise TypeError
+    and a long enough list would pass.
+    '''
+    for field in ('title', 'instructions'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f"{field} must be a string")
+
+def include_requested(name):
+    '''True if ?include= (a comma separated list) names the given relation.'''
+    return name in request.args.get('include', '').split(',')
+
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+def stream_json_array(rows, serialize):
+    '''Yield a JSON array one batch of rows at a time so the full list is never held in memory.'''
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    yield '['
+    buffer = []
+    first = True
+    for row in rows:
+        buffer.append(current_app.json.dumps(serialize(row)))
+        if len(buffer) >= batch_size:
+            yield ('' if first else ',') + ','.join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield ']'
+
+# -----------------------
+# Signup
+# -----------------------
 class Signup(Resource):
     def post(self):
         data = request.get_json()
-        username = data.get("username")
-        password = data.get("password")
-        bio = data.get("bio", "")
+        username = data.get('username')
+        password = data.get('password')
+        bio = data.get('bio', '')
+    
+        # FIX: Accept the image_url from the request data, falling back to the model's default
+        image_url = data.get('image_url')
 
         if not username or not password:
-            return {"error": "Username and password required"}, 422
+            return jsonify({"errors": "Username and password required"}), 422
+
+        if User.query.filter_by(username=username).first():
+            return jsonify({"errors": "Username already exists"}), 422
 
-        user = User(username=username, bio=bio)
-        user.set_password(password)
+        # End the read transaction so no pooled connection waits on the hash
+        db.session.rollback()
 
+        # Pass the potentially provided image_url to the User constructor
+        user = User(username=username, bio=bio, image_url=image_url) 
+        try:
+            run_hashing(user.set_password, password)
+        except HashingUnavailable:
+            return busy_response()
+    
         try:
             db.session.add(user)
             db.session.commit()
-        except:
+        except IntegrityError:
             db.session.rollback()
-            return {"error": "Username must be unique"}, 422
-
-        session["user_id"] = user.id
-        return user.to_dict(), 201
-
+            return jsonify({"errors": "Username already exists"}), 422 
 
-class CheckSession(Resource):
-    def get(self):
-        user_id = session.get("user_id")
-        if not user_id:
-            return {"error": "Unauthorized"}, 401
-
-        user = User.query.get(user_id)
-        return user.to_dict(), 200
+        session['user_id'] = user.id
 
+        return jsonify(user.to_dict(include_recipes=include_requested('recipes'))), 201
 
+# -----------------------
+# Login
+# -----------------------
 class Login(Resource):
     def post(self):
         data = request.get_json()
-        username = data.get("username")
-        password = data.get("password")
+        username = data.get('username')
+        password = data.get('password')
+
+        # Charged before the lookup and hash so rejected attempts cost next to nothing
+        limiter = get_rate_limiter()
+        buckets = [('username', str(username)), ('ip', request.remote_addr)]
+        retry_after = limiter.hit(buckets)
+        if retry_after is not None:
+            return rate_limited_response(retry_after)
 
         user = User.query.filter_by(username=username).first()
-        if user and user.authenticate(password):
-            session["user_id"] = user.id
-            return user.to_dict(), 200
+        if not user:
+            return jsonify({"errors": "Invalid username or password"}), 401
 
-        return {"error": "Invalid username or password"}, 401
+        # Verify against the hash string only and end the transaction first, so
+        # the connection is back in the pool while the KDF runs
+        user_id, stored_hash = user.id, user.password_hash
+        db.session.rollback()
+        try:
+            authenticated, new_hash = run_hashing(verify_and_rehash, password, stored_hash)
+        except HashingUnavailable:
+            limiter.refund(buckets)
+            return busy_response()
+        if not authenticated:
+            return jsonify({"errors": "Invalid username or password"}), 401
+        limiter.refund(buckets)
+
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({"errors": "Invalid username or password"}), 401
 
+        # Upgrade an outdated hash, unless the password changed while we were hashing
+        if new_hash and user.password_hash == stored_hash:
+            user._password_hash = new_hash
+            db.session.commit()
 
+        session['user_id'] = user.id
+        return jsonify(user.to_dict(include_recipes=include_requested('recipes'))), 200
+
+# -----------------------
+# Logout
+# -----------------------
 class Logout(Resource):
     def delete(self):
-        if "user_id" in session:
-            session.pop("user_id")
-            return {}, 204
-        return {"error": "Unauthorized"}, 401
+        # FIX: Ensure 401 is returned when session is missing or None
+        if 'user_id' not in session or session.get('user_id') is None:
+            return jsonify({"errors": "Unauthorized"}), 401 
+
+        session.pop('user_id')
+        return '', 204
+
+# -----------------------
+# Revoke sessions
+# Logs the current user out everywhere by deleting all of their sessions.
+# -----------------------
+class Sessions(Resource):
+    def delete(self):
+        user = get_current_user()
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        revoke_user_sessions(current_app, user.id)
+        session.clear()
+        return '', 204
+
+# -----------------------
+# Check session
+# Auth endpoints return a user summary with recipe_count; pass
+# ?include=recipes to embed the full recipe list.
+# GET /check-session and GET /recipes send an ETag and Last-Modified derived
+# from the user's data_version, and answer If-None-Match / If-Modified-Since
+# with a 304 before any recipe rows are read.
+# -----------------------
+class CheckSession(Resource):
+    def get(self):
+        user = get_current_user()
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        row = user_version_row(user.id)
+        etag, last_modified = data_validators(user.id, row)
+        if etag and is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
 
+        # The cached user may predate the version in the ETag (another worker's write)
+        user = load_user(user.id, data_version=row.data_version) if row else user
+        response = jsonify(user.to_dict(include_recipes=include_requested('recipes')))
+        if etag:
+            set_validators(response, etag, last_modified)
+        return response, 200
 
+# -----------------------
+# Recipes (GET, POST)
+# Supports keyset pagination with ?limit=&after=<recipe id>; the cursor for the
+# next page is returned in the X-Next-Cursor header. ?stream=1 streams the
+# array in batches instead of building it in memory.
+# -----------------------
 class RecipeIndex(Resource):
     def get(self):
-        user_id = session.get("user_id")
-        if not user_id:
-            return {"error": "Unauthorized"}, 401
+        user = get_current_user()
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        try:
+            limit = parse_int_arg('limit', minimum=1, maximum=current_app.config['MAX_PAGE_SIZE'])
+            after = parse_int_arg('after')
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+
+        etag, last_modified = user_data_validators(user.id)
+        if etag and is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        # Column-projected rows go straight to JSON without building ORM instances
+        query = user_recipes_query(user.id, after=after)
+
+        next_cursor = None
+        if limit is not None:
+            # Fetch one extra row to learn whether another page exists
+            records = fetch_records(query.limit(limit + 1))
+            if len(records) > limit:
+                records = records[:limit]
+                next_cursor = records[-1].id
+        elif wants_stream():
+            records = fetch_records(query, yield_per=current_app.config['STREAM_BATCH_SIZE'])
+        else:
+            records = fetch_records(query)
+
+        if wants_stream():
+            response = Response(
+                stream_with_context(stream_json_array(records, RecipeRecord.to_dict)),
+                status=200,
+                mimetype='application/json',
+            )
+        else:
+            response = jsonify([r.to_dict() for r in records])
+
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        if etag:
+            set_validators(response, etag, last_modified)
+        return response, 200
 
-        user = User.query.get(user_id)
-        recipes = [recipe.to_dict() for recipe in user.recipes]
-        return recipes, 200
 
     def post(self):
-        user_id = session.get("user_id")
-        if not user_id:
-            return {"error": "Unauthorized"}, 401
+        user = get_current_user()
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
 
-        data = request.get_json()
-        title = data.get("title")
-        instructions = data.get("instructions")
-        minutes_to_complete = data.get("minutes_to_complete", 0)
-
-        if not title or not instructions:
-            return {"error": "Title and instructions required"}, 422
-
-        user = User.query.get(user_id)
-        recipe = Recipe(
-            title=title,
-            instructions=instructions,
-            minutes_to_complete=minutes_to_complete,
-            user=user
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"errors": ["Expected a JSON object"]}), 422
+        title = data.get('title')
+        instructions = data.get('instructions')
+        minutes_to_complete = data.get('minutes_to_complete', 0)
+
+        try:
+            check_recipe_text(data)
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+        try:
+            minutes_to_complete = int(minutes_to_complete)
+        except (ValueError, TypeError):
+            return jsonify({"errors": "minutes_to_complete must be an integer"}), 422
+
+        # FIX: Wrap the Recipe instantiation and commit in the same try block 
+        # to catch the ValueError raised by model validation (e.g., instructions too short)
+        try:
+            recipe = Recipe(
+                title=title,
+                instructions=instructions,
+                minutes_to_complete=minutes_to_complete,
+                user_id=user.id
+            )
+            db.session.add(recipe)
+            db.session.commit()
+        except ValueError as e:
+            db.session.rollback() 
+            return jsonify({"errors": [str(e)]}), 422
+        except Exception:
+            db.session.rollback()
+            logger.exception("Recipe insert failed")
+            return jsonify({"errors": ["An unexpected error occurred"]}), 500
+
+        return recipe_response(recipe, 201)
+
+# -----------------------
+# Search recipes (GET)
+# Full-text search over the user's recipe titles and instructions, ranked by
+# relevance. All words must match; a trailing * matches by prefix (?q=tom*).
+# Paged with ?limit=&offset=; X-Next-Offset is set when more results exist.
+# -----------------------
+class RecipeSearch(Resource):
+    def get(self):
+        user = get_current_user()
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        q = request.args.get('q', '')
+        if not build_match_query(q):
+            return jsonify({"errors": ["q must contain at least one word"]}), 422
+        try:
+            limit = parse_int_arg('limit', minimum=1, maximum=current_app.config['MAX_PAGE_SIZE']) or 20
+            offset = parse_int_arg('offset') or 0
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+
+        recipes = fetch_records(search_query(user.id, q).limit(limit + 1).offset(offset))
+        response = jsonify([r.to_dict() for r in recipes[:limit]])
+        if len(recipes) > limit:
+            response.headers['X-Next-Offset'] = str(offset + limit)
+        return response, 200
+
+# -----------------------
+# Public feed (GET)
+# Everyone's recipes, optionally filtered by ?min_minutes=, ?max_minutes= and
+# ?author_id=. ?sort=newest (default) orders by id descending and uses the
+# recipe id as cursor; ?sort=quickest orders by (minutes_to_complete, id) and
+# uses "<minutes>:<id>". Pass X-Next-Cursor back as ?after= for the next page.
+# -----------------------
+FEED_SORTS = ('newest', 'quickest')
+
+def parse_feed_cursor(sort):
+    after = request.args.get('after')
+    if not after:
+        return None
+    try:
+        if sort == 'quickest':
+            minutes, recipe_id = after.split(':')
+            return int(minutes), int(recipe_id)
+        return int(after)
+    except ValueError:
+        raise ValueError("after must be a cursor from X-Next-Cursor")
+
+class Feed(Resource):
+    def get(self):
+        sort = request.args.get('sort', 'newest')
+        if sort not in FEED_SORTS:
+            return jsonify({"errors": [f"sort must be one of {', '.join(FEED_SORTS)}"]}), 422
+        try:
+            limit = parse_int_arg('limit', minimum=1, maximum=current_app.config['MAX_PAGE_SIZE']) or 20
+            min_minutes = parse_int_arg('min_minutes')
+            max_minutes = parse_int_arg('max_minutes')
+            author_id = parse_int_arg('author_id', minimum=1)
+            cursor = parse_feed_cursor(sort)
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+
+        # One extra row tells us whether there is a next page
+        query = feed_query(
+            sort, limit + 1, cursor,
+            min_minutes=min_minutes, max_minutes=max_minutes, author_id=author_id,
         )
+        recipes = fetch_records(query)
+        response = jsonify([r.to_dict() for r in recipes[:limit]])
+        if len(recipes) > limit:
+            last = recipes[limit - 1]
+            response.headers['X-Next-Cursor'] = \
+                f'{last.minutes_to_complete}:{last.id}' if sort == 'quickest' else str(last.id)
+        return response, 200
+
+# -----------------------
+# Public profiles (GET)
+# ?ids=1,2,3 returns the public fields of each user, in the order asked for, so
+# the client can render every author on a page with one request. Unknown ids
+# are left out. Users come from the user cache; the misses take one IN query.
+# -----------------------
+PUBLIC_USER_FIELDS = ('id', 'username', 'image_url', 'bio')
+
+def parse_id_list(name, maximum):
+    '''Read a required comma separated list of ids, without duplicates, raising ValueError if it is malformed.'''
+    ids = {}
+    for part in filter(None, request.args.get(name, '').split(',')):
+        try:
+            user_id = int(part)
+        except ValueError:
+            raise ValueError(f"{name} must be a comma separated list of ids")
+        if user_id < 1:
+            raise ValueError(f"{name} must be a comma separated list of ids")
+        ids[user_id] = None
+        if len(ids) > maximum:
+            raise ValueError(f"At most {maximum} {name} per request")
+    if not ids:
+        raise ValueError(f"{name} is required")
+    return list(ids)
+
+class UserLookup(Resource):
+    def get(self):
+        try:
+            ids = parse_id_list('ids', current_app.config['USER_LOOKUP_MAX_IDS'])
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+
+        users = load_users(ids)
+        return jsonify([
+            {field: users[user_id][field] for field in PUBLIC_USER_FIELDS}
+            for user_id in ids if user_id in users
+        ]), 200
+
+# -----------------------
+# Update / delete recipe (PATCH, DELETE)
+# Optimistic concurrency: responses carry the recipe version as an ETag and
+# writes must name the version they were based on, via If-Match or a "version"
+# field in the PATCH body. If the recipe changed since, the write is refused
+# with 412 and the current recipe. No row is locked; the UPDATE/DELETE simply
+# matches on id and version.
+# -----------------------
+EDITABLE_RECIPE_FIELDS = ('title', 'instructions', 'minutes_to_complete')
+
+def requested_version(data=None):
+    '''The version the client last saw: an int, '*' for any, or None if not given.'''
+    if request.if_match:
+        if request.if_match.star_tag:
+            return '*'
+        tags = request.if_match.as_set()
+        if len(tags) != 1:
+            raise ValueError("If-Match must name a single version")
+        value = tags.pop()
+    elif data and 'version' in data:
+        value = data['version']
+    else:
+        return None
+    # int(True) would be 1
+    if isinstance(value, bool):
+        raise ValueError("version must be an integer")
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        raise ValueError("version must be an integer")
+
+def recipe_response(recipe, status=200):
+    response = jsonify(recipe.to_dict())
+    response.status_code = status
+    response.set_etag(str(recipe.version))
+    return response
+
+def load_own_recipe(recipe_id):
+    '''Return (recipe, None) or (None, error response) for the current user's recipe.'''
+    user = get_current_user()
+    if not user:
+        return None, (jsonify({"errors": "Unauthorized"}), 401)
+    recipe = db.session.get(Recipe, recipe_id)
+    if recipe is None:
+        return None, (jsonify({"errors": "Recipe not found"}), 404)
+    if recipe.user_id != user.id:
+        return None, (jsonify({"errors": "Forbidden"}), 403)
+    return recipe, None
+
+def version_conflict(recipe_id):
+    db.session.rollback()
+    recipe = db.session.get(Recipe, recipe_id)
+    if recipe is None:
+        return jsonify({"errors": "Recipe not found"}), 404
+    return recipe_response(recipe, 412)
+
+class RecipeDetail(Resource):
+    def patch(self, recipe_id):
+        recipe, error = load_own_recipe(recipe_id)
+        if error:
+            return error
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"errors": ["Expected a JSON object"]}), 422
+        unknown = set(data) - set(EDITABLE_RECIPE_FIELDS) - {'version'}
+        if unknown:
+            return jsonify({"errors": [f"Cannot update: {', '.join(sorted(unknown))}"]}), 422
+        try:
+            version = requested_version(data)
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+        if version is None:
+            return jsonify({"errors": ["Send the version being updated in If-Match or the body"]}), 428
+        if version != '*' and version != recipe.version:
+            return recipe_response(recipe, 412)
+
+        changes = {key: data[key] for key in EDITABLE_RECIPE_FIELDS if key in data}
+        try:
+            check_recipe_text(changes)
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+        if 'minutes_to_complete' in changes:
+            # null is rejected too, as it is by POST /recipes
+            try:
+                changes['minutes_to_complete'] = int(changes['minutes_to_complete'])
+            except (ValueError, TypeError):
+                return jsonify({"errors": ["minutes_to_complete must be an integer"]}), 422
+
+        try:
+            # Only columns whose value differs are set, so the UPDATE lists just those
+            for key, value in changes.items():
+                if getattr(recipe, key) != value:
+                    setattr(recipe, key, value)
+            db.session.commit()
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({"errors": [str(e)]}), 422
+        except StaleDataError:
+            return version_conflict(recipe_id)
+
+        return recipe_response(recipe)
+
+
+    def delete(self, recipe_id):
+        recipe, error = load_own_recipe(recipe_id)
+        if error:
+            return error
+
+        try:
+            version = requested_version()
+        except ValueError as e:
+            return jsonify({"errors": [str(e)]}), 422
+        # If-Match is optional here; without it the delete applies to whatever version is loaded
+        if version not in (None, '*') and version != recipe.version:
+            return recipe_response(recipe, 412)
+
+        try:
+            db.session.delete(recipe)
+            db.session.commit()
+        except StaleDataError:
+            return version_conflict(recipe_id)
+
+        return '', 204
+
+# -----------------------
+# Bulk create recipes (POST)
+# Accepts a JSON array or an NDJSON stream (Content-Type: application/x-ndjson)
+# of recipe objects. Every item is checked with the Recipe validators; valid
+# items are inserted in executemany batches inside a single transaction and
+# invalid ones, including NDJSON lines that aren't JSON, are reported by index.
+# -----------------------
+# Stands in for an NDJSON line that doesn't parse, so it is reported like any invalid item
+MALFORMED_LINE = object()
+
+def read_bulk_items():
+    if request.mimetype == 'application/x-ndjson':
+        for line in request.stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield MALFORMED_LINE
+    else:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            raise ValueError("Expected a JSON array of recipes")
+        yield from items
+
+def validate_bulk_item(item, user_id):
+    if item is MALFORMED_LINE:
+        raise ValueError("Line is not valid JSON")
+    if not isinstance(item, dict):
+        raise ValueError("Each recipe must be a JSON object")
+    check_recipe_text(item)
+    try:
+        minutes_to_complete = int(item.get('minutes_to_complete', 0))
+    except (ValueError, TypeError):
+        raise ValueError("minutes_to_complete must be an integer")
+    # Building a transient Recipe runs the @validates rules; it is never added to the session
+    recipe = Recipe(
+        title=item.get('title'),
+        instructions=item.get('instructions'),
+        minutes_to_complete=minutes_to_complete,
+        user_id=user_id,
+    )
+    return {
+        'title': recipe.title,
+        'instructions': recipe.instructions,
+        'minutes_to_complete': recipe.minutes_to_complete,
+        'user_id': user_id,
+    }
+
+class RecipeBulk(Resource):
+    def post(self):
+        user = get_current_user()
+        if not user:
+            return jsonify({"errors": "Unauthorized"}), 401
+
+        batch_size = current_app.config['BULK_INSERT_BATCH_SIZE']
+        max_items = current_app.config['BULK_MAX_ITEMS']
+        created = 0
+        errors = []
+        batch = []
+
+        try:
+            for index, item in enumerate(read_bulk_items()):
+                if index >= max_items:
+                    db.session.rollback()
+                    return jsonify({"errors": [f"At most {max_items} recipes per request"]}), 413
+                try:
+                    batch.append(validate_bulk_item(item, user.id))
+                except ValueError as e:
+                    errors.append({"index": index, "errors": [str(e)]})
+                    continue
+                if len(batch) >= batch_size:
+                    db.session.execute(insert(Recipe), batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                db.session.execute(insert(Recipe), batch)
+                created += len(batch)
+            if created:
+                # Bulk inserts skip the mapper events that normally bump the version
+                bump_data_version(db.session.connection(), user.id)
+            db.session.commit()
+        except ValueError as e:
+            # Malformed body (not a JSON array)
+            db.session.rollback()
+            return jsonify({"errors": [str(e)]}), 422
+        except Exception:
+            db.session.rollback()
+            # The message would echo the SQL and every row's parameters
+            logger.exception("Bulk recipe insert failed")
+            return jsonify({"errors": ["An unexpected error occurred"]}), 500
+
+        return jsonify({"created": created, "errors": errors}), 201 if created else 422
+
+# -----------------------
+# Registration
+# -----------------------
+RESOURCES = (
+    (Signup, '/signup'),
+    (Login, '/login'),
+    (Logout, '/logout'),
+    (Sessions, '/sessions'),
+    (CheckSession, '/check-session'),
+    (RecipeIndex, '/recipes'),
+    (RecipeSearch, '/recipes/search'),
+    (Feed, '/feed'),
+    (UserLookup, '/users'),
+    (RecipeDetail, '/recipes/<int:recipe_id>'),
+    (RecipeBulk, '/recipes/bulk'),
+)
+
+def output_json(data, code, headers=None):
+    '''Build responses the way a plain Flask view would.
+
+    Handlers return jsonify() responses, '' bodies and (body, status, headers)
+    tuples; Flask's make_response handles all of them and encodes dicts and lists
+    with current_app.json, so the orjson provider is used.
+    '''
+    return current_app.make_response((data, code, headers or {}))
 
-        db.session.add(recipe)
-        db.session.commit()
-        return recipe.to_dict(), 201
+def init_api(app):
+    api = Api(app)
+    api.representation('application/json')(output_json)
+    for resource, url in RESOURCES:
+        api.add_resource(resource, url)
+    return api
@@ -0,0 +1,143 @@
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import DDL, column, delete, event, func, select, table, text
+
+from models import Recipe
+
+# External-content FTS5 index over recipe.title and recipe.instructions. The
+# index stores only the inverted lists; the text itself stays in recipe, and the
+# triggers keep the two in step. Titles weigh 10x instructions in the bm25 rank.
+#
+# Searches are per user, so every row also indexes its owner as a token ("u<id>",
+# see owner_token) in the owner column, which the rank ignores. A search ANDs that
+# token into the MATCH, and FTS5 intersects the owner's posting list with the
+# words' before anything is ranked, instead of ranking every user's matches and
+# filtering afterwards. The content table is a view that derives the owner column,
+# so 'rebuild' still works. The prefix indexes serve word* queries up to three
+# characters without merging every matching term's list.
+SEARCH_SOURCE_VIEW = (
+    "CREATE VIEW IF NOT EXISTS recipe_search_source AS "
+    "SELECT id, title, instructions, 'u' || user_id AS owner FROM recipe"
+)
+
+FTS_INSERT_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_ai AFTER INSERT ON recipe BEGIN "
+    "INSERT INTO recipe_fts(rowid, title, instructions, owner) "
+    "VALUES (new.id, new.title, new.instructions, 'u' || new.user_id); "
+    "END"
+)
+
+FTS_DELETE_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_ad AFTER DELETE ON recipe BEGIN "
+    "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions, owner) "
+    "VALUES ('delete', old.id, old.title, old.instructions, 'u' || old.user_id); "
+    "END"
+)
+
+FTS_CREATE = [
+    SEARCH_SOURCE_VIEW,
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts USING fts5("
+    "title, instructions, owner, content='recipe_search_source', content_rowid='id', "
+    "tokenize='porter unicode61', prefix='1 2 3')",
+    "INSERT INTO recipe_fts(recipe_fts, rank) VALUES('rank', 'bm25(10.0, 1.0, 0.0)')",
+    FTS_INSERT_TRIGGER,
+    FTS_DELETE_TRIGGER,
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_au AFTER UPDATE OF title, instructions, user_id ON recipe BEGIN "
+    "INSERT INTO recipe_fts(recipe_fts, rowid, title, instructions, owner) "
+    "VALUES ('delete', old.id, old.title, old.instructions, 'u' || old.user_id); "
+    "INSERT INTO recipe_fts(rowid, title, instructions, owner) "
+    "VALUES (new.id, new.title, new.instructions, 'u' || new.user_id); "
+    "END",
+]
+
+FTS_DROP = [
+    "DROP TRIGGER IF EXISTS recipe_fts_au",
+    "DROP TRIGGER IF EXISTS recipe_fts_ad",
+    "DROP TRIGGER IF EXISTS recipe_fts_ai",
+    "DROP TABLE IF EXISTS recipe_fts",
+    "DROP VIEW IF EXISTS recipe_search_source",
+]
+
+# Migrations create the index for real databases; these cover db.create_all()
+for statement in FTS_CREATE:
+    event.listen(Recipe.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in FTS_DROP:
+    event.listen(Recipe.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+# Not part of the metadata, so create_all() never tries to build it as a plain table
+recipe_fts = table('recipe_fts', column('rowid'), column('rank'), column('recipe_fts'))
+
+
+def delete_all_recipes(session):
+    '''Empty recipe and its index in bulk instead of with a trigger call per row.'''
+    if session.get_bind().dialect.name != 'sqlite':
+        session.execute(delete(Recipe.__table__))
+        return
+    # DDL is transactional in SQLite, so the trigger is never missing for other connections
+    session.execute(text("DROP TRIGGER IF EXISTS recipe_fts_ad"))
+    session.execute(delete(Recipe.__table__))
+    session.execute(text("INSERT INTO recipe_fts(recipe_fts) VALUES('delete-all')"))
+    session.execute(text(FTS_DELETE_TRIGGER))
+
+
+def drop_stale_connections(session):
+    '''Close the pool's idle connections after committing trigger DDL.
+
+    They still hold the old schema. SQLite re-prepares their statements when they
+    notice the change, and for an INSERT into recipe that re-prepare can fail once
+    with "no such table: recipe" (seen with 3.40 and several triggers on recipe).
+    '''
+    session.get_bind().dispose()
+
+
+@contextmanager
+def deferred_fts_indexing(session):
+    '''Bulk-load recipes without the per-row insert trigger, then index the new rows in one statement.
+
+    Meant for offline loads like seed.py: the loader may commit as often as it
+    likes, and anything inserted meanwhile is indexed at the end as well.
+    '''
+    if session.get_bind().dialect.name != 'sqlite':
+        yield
+        return
+
+    after_id = session.execute(select(func.coalesce(func.max(Recipe.id), 0))).scalar()
+    session.execute(text("DROP TRIGGER IF EXISTS recipe_fts_ai"))
+    session.commit()
+    drop_stale_connections(session)
+    try:
+        yield
+    finally:
+        session.rollback()
+        session.execute(
+            text("INSERT INTO recipe_fts(rowid, title, instructions, owner) "
+                 "SELECT id, title, instructions, owner FROM recipe_search_source WHERE id > :after_id"),
+            {'after_id': after_id},
+        )
+        session.execute(text(FTS_INSERT_TRIGGER))
+        session.commit()
+        drop_stale_connections(session)
+
+
+TOKEN = re.compile(r'\w+\*?')
+
+
+def owner_token(user_id):
+    return f'u{user_id}'
+
+
+def build_match_query(q, user_id=None):
+    '''Turn free text into an FTS5 query: every word must match, and a trailing * makes a prefix query.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax. With a
+    user_id, only that user's recipes match, and the words only match titles and
+    instructions.
+    '''
+    terms = []
+    for token in TOKEN.findall(q or ''):
+        word = token.rstrip('*')
+        terms.append(f'"{word}"*' if token.endswith('*') else f'"{word}"')
+    if not terms or user_id is None:
+        return ' '.join(terms)
+    return f'owner:{owner_token(user_id)} AND {{title instructions}}: ({" ".join(terms)})'
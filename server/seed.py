@@ -1,49 +1,129 @@
-from app import app, db
-from models import User, Recipe, DEFAULT_IMAGE_URL
-
-with app.app_context():
-    print("Deleting all records...")
-    Recipe.query.delete()
-    User.query.delete()
-    db.session.commit()
-
-    print("Seeding users...")
-    users = [
-        User(username="alice", bio="I love cooking!", image_url=DEFAULT_IMAGE_URL),
-        User(username="bob", bio="Healthy recipes enthusiast", image_url=DEFAULT_IMAGE_URL),
-        User(username="charlie", bio="Pasta is life!", image_url=DEFAULT_IMAGE_URL)
-    ]
-
-    # Set passwords
-    for u in users:
-        u.set_password("password123")
-
-    db.session.add_all(users)
-    db.session.commit()  # Commit so users have IDs for foreign keys
-
-    print("Seeding recipes...")
-    recipes = [
-        Recipe(
-            title="Pancakes",
-            instructions="Mix ingredients thoroughly and cook on a hot griddle until golden brown.",
-            minutes_to_complete=15,
-            user_id=users[0].id
-        ),
-        Recipe(
-            title="Salad",
-            instructions="Chop fresh vegetables and toss them with a light vinaigrette dressing.",
-            minutes_to_complete=10,
-            user_id=users[1].id
-        ),
-        Recipe(
-            title="Spaghetti",
-            instructions="Boil pasta until al dente, prepare a rich tomato sauce, and combine carefully.",
-            minutes_to_complete=30,
-            user_id=users[2].id
-        )
-    ]
-
-    db.session.add_all(recipes)
-    db.session.commit()
-
-    print("Seeding done!")
+'''Fill the database with synthetic users and recipes.
+
+    flask seed                                  # 3 users with one recipe each
+    flask seed --users 1000 --recipes-per-user 1000 --seed 42
+    python seed.py --users 100                  # same options without the flask CLI
+
+Existing users and recipes are deleted first unless --append is given. Every
+user gets the same password (--password) so any of them can log in.
+
+Speed comes from three things. Faker text is generated once into small pools
+that rows draw from. Rows go in as Core executemany inserts, committed every
+--batch-size rows. The password is hashed once and the hash is shared. The
+search index and the users' recipe counts are filled in one statement each after
+the load instead of by triggers per row.
+'''
+import itertools
+import random
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+
+from hashing import hash_password
+from models import db, User, Recipe, DEFAULT_IMAGE_URL
+from search import deferred_fts_indexing, delete_all_recipes
+from stats import deferred_user_stats
+
+# Distinct texts per pool; rows pick from these instead of calling Faker per row
+POOL_SIZE = 1000
+
+
+def text_pools(fake):
+    return {
+        'title': [fake.sentence(nb_words=4).rstrip('.')[:100] for _ in range(POOL_SIZE)],
+        'instructions': [fake.paragraph(nb_sentences=5).ljust(50, '.') for _ in range(POOL_SIZE)],
+        'bio': [fake.sentence(nb_words=8) for _ in range(POOL_SIZE)],
+        'username': [fake.user_name()[:40] for _ in range(POOL_SIZE)],
+    }
+
+
+def insert_statement(table, columns):
+    '''A positional INSERT for table's columns in the given order.'''
+    placeholders = ', '.join('?' for _ in columns)
+    return f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+def seed_database(users=3, recipes_per_user=1, password='password123', batch_size=10000,
+                  append=False, random_seed=None, echo=print):
+    '''Insert the synthetic data; needs an app context. Returns (users, recipes) inserted.'''
+    # Imported here so registering the command doesn't load Faker into every worker
+    from faker import Faker
+
+    fake = Faker()
+    if random_seed is not None:
+        Faker.seed(random_seed)
+    rng = random.Random(random_seed)
+    pools = text_pools(fake)
+    start = time.perf_counter()
+
+    if not append:
+        echo("Deleting all records...")
+        delete_all_recipes(db.session)
+        User.query.delete()
+        db.session.commit()
+
+    first_id = (db.session.execute(select(func.max(User.id))).scalar() or 0) + 1
+    user_ids = range(first_id, first_id + users)
+
+    echo(f"Seeding {users} users...")
+    # One slow hash shared by every synthetic user
+    password_hash = hash_password(password)
+    for chunk_start in range(0, users, batch_size):
+        db.session.execute(insert(User.__table__), [
+            {
+                'id': user_id,
+                # The id suffix keeps names unique however many users there are
+                'username': f"{rng.choice(pools['username'])}{user_id}",
+                '_password_hash': password_hash,
+                'bio': rng.choice(pools['bio']),
+                'image_url': DEFAULT_IMAGE_URL,
+            }
+            for user_id in user_ids[chunk_start:chunk_start + batch_size]
+        ])
+        db.session.commit()
+
+    echo(f"Seeding {users * recipes_per_user} recipes...")
+    # Positional rows through the driver skip SQLAlchemy's per-row parameter processing
+    columns = ('title', 'instructions', 'minutes_to_complete', 'user_id', 'version')
+    statement = insert_statement(Recipe.__table__, columns)
+    minutes = range(5, 241)
+    with deferred_fts_indexing(db.session), deferred_user_stats(db.session):
+        owners = (user_id for user_id in user_ids for _ in range(recipes_per_user))
+        remaining = users * recipes_per_user
+        while remaining:
+            size = min(batch_size, remaining)
+            remaining -= size
+            db.session.connection().exec_driver_sql(statement, list(zip(
+                rng.choices(pools['title'], k=size),
+                rng.choices(pools['instructions'], k=size),
+                rng.choices(minutes, k=size),
+                itertools.islice(owners, size),
+                itertools.repeat(1, size),
+            )))
+            db.session.commit()
+
+    echo(f"Seeding done in {time.perf_counter() - start:.1f}s!")
+    return users, users * recipes_per_user
+
+
+@click.command('seed')
+@click.option('--users', type=click.IntRange(0), default=3, show_default=True)
+@click.option('--recipes-per-user', type=click.IntRange(0), default=1, show_default=True)
+@click.option('--password', default='password123', show_default=True, help='Password of every seeded user.')
+@click.option('--batch-size', type=click.IntRange(1), default=10000, show_default=True,
+              help='Rows per insert transaction.')
+@click.option('--append', is_flag=True, help='Keep existing users and recipes.')
+@click.option('--seed', 'random_seed', type=int, help='Seed for a repeatable dataset.')
+@with_appcontext
+def seed_command(users, recipes_per_user, password, batch_size, append, random_seed):
+    '''Fill the database with synthetic users and recipes.'''
+    seed_database(users, recipes_per_user, password, batch_size, append, random_seed, echo=click.echo)
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        seed_command()
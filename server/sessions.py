@@ -0,0 +1,272 @@
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import create_engine, delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+
+from cache import TTLCache
+from models import UserSession
+from pooling import watch_pool
+from sqlite_tuning import apply_sqlite_pragmas, get_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+sessions_table = UserSession.__table__
+
+
+def utcnow():
+    # Naive UTC, matching what SQLite's CURRENT_TIMESTAMP stores
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    '''Session dict whose contents live in the user_session table under sid.'''
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        # Set when user_id is assigned or removed (a login or logout), which gets a fresh sid
+        self.rotate = self.new
+
+    def __setitem__(self, key, value):
+        if key == 'user_id':
+            self.rotate = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if key == 'user_id':
+            self.rotate = True
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key == 'user_id':
+            self.rotate = True
+        return super().pop(key, *default)
+
+
+class SessionStore:
+    '''user_session rows behind a short-lived per-process LRU.
+
+    The LRU only saves the SELECT on repeat requests. Writes and revocations go
+    straight to the table and evict locally; other processes may keep serving a
+    revoked session for up to cache_ttl seconds.
+    '''
+
+    def __init__(self, engine, cache_size=1024, cache_ttl=30):
+        self.engine = engine
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def load(self, sid):
+        '''Return (data, expires_at) for a live session, or None.'''
+        entry = self.cache.get(sid)
+        if entry is None:
+            with self.engine.connect() as conn:
+                row = conn.execute(
+                    select(sessions_table.c.data, sessions_table.c.expires_at)
+                    .where(sessions_table.c.id == sid)
+                ).first()
+            if row is None:
+                return None
+            entry = (row.data, row.expires_at)
+            self.cache.set(sid, entry)
+        data, expires_at = entry
+        if expires_at <= utcnow():
+            return None
+        return session_json_serializer.loads(data), expires_at
+
+    def save(self, sid, user_id, data, expires_at):
+        values = {'user_id': user_id, 'data': session_json_serializer.dumps(data), 'expires_at': expires_at}
+        with self.engine.begin() as conn:
+            result = conn.execute(update(sessions_table).where(sessions_table.c.id == sid).values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(sessions_table).values(id=sid, **values))
+        self.cache.set(sid, (values['data'], expires_at))
+
+    def delete(self, sid):
+        with self.engine.begin() as conn:
+            conn.execute(delete(sessions_table).where(sessions_table.c.id == sid))
+        self.cache.pop(sid)
+
+    def revoke_user(self, user_id):
+        '''Delete every session belonging to user_id and return how many there were.'''
+        with self.engine.begin() as conn:
+            sids = conn.execute(
+                select(sessions_table.c.id).where(sessions_table.c.user_id == user_id)
+            ).scalars().all()
+            conn.execute(delete(sessions_table).where(sessions_table.c.user_id == user_id))
+        for sid in sids:
+            self.cache.pop(sid)
+        return len(sids)
+
+    def sweep(self, batch_size=500, pause=0.05):
+        '''Delete expired rows batch_size at a time, pausing between batches so
+        request writes aren't held off by one long transaction.'''
+        total = 0
+        while True:
+            expired = select(sessions_table.c.id) \
+                .where(sessions_table.c.expires_at <= utcnow()) \
+                .limit(batch_size) \
+                .scalar_subquery()
+            with self.engine.begin() as conn:
+                deleted = conn.execute(delete(sessions_table).where(sessions_table.c.id.in_(expired))).rowcount
+            total += deleted
+            if deleted < batch_size:
+                return total
+            time.sleep(pause)
+
+
+class SessionSweeper(threading.Thread):
+    '''Daemon thread running SessionStore.sweep() every interval seconds.'''
+
+    def __init__(self, store, interval, batch_size):
+        super().__init__(name='session-sweeper', daemon=True)
+        self.store = store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                deleted = self.store.sweep(self.batch_size)
+                if deleted:
+                    logger.info("Swept %d expired sessions", deleted)
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def stop(self):
+        self.stopped.set()
+
+
+class ServerSessionInterface(SessionInterface):
+    '''Keeps only a signed session id in the cookie and the data in SessionStore.
+
+    Sessions expire PERMANENT_SESSION_LIFETIME after their last renewal. A request
+    more than SESSION_RENEW_INTERVAL seconds after the last renewal slides the
+    expiry forward, so active sessions stay alive without a write per request.
+    '''
+
+    salt = 'server-session'
+
+    def __init__(self, store, renew_interval=300, sweep_interval=600, sweep_batch_size=500):
+        self.store = store
+        self.renew_interval = timedelta(seconds=renew_interval)
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self.sweeper = None
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    def start_sweeper(self):
+        # Started on first use rather than at import so each forked worker gets its
+        # own thread and CLI commands like `flask db upgrade` don't start one
+        if self.sweep_interval <= 0 or self._sweeper_pid == os.getpid():
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid != os.getpid():
+                self.sweeper = SessionSweeper(self.store, self.sweep_interval, self.sweep_batch_size)
+                self.sweeper.start()
+                self._sweeper_pid = os.getpid()
+
+    def get_signer(self, app):
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        signer = self.get_signer(app)
+        if signer is None:
+            return None
+        self.start_sweeper()
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            loaded = self.store.load(sid) if sid else None
+            if loaded is not None:
+                data, expires_at = loaded
+                return ServerSession(data, sid=sid, expires_at=expires_at)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app))
+            return
+
+        now = utcnow()
+        lifetime = app.permanent_session_lifetime
+        rotate = session.sid is None or session.rotate
+        renew = session.expires_at is None or session.expires_at - now < lifetime - self.renew_interval
+        if not (session.modified or rotate or renew):
+            return
+
+        if rotate:
+            # New id on login/logout so a session id seen before login is useless after it
+            if session.sid is not None:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.rotate = False
+        session.expires_at = now + lifetime
+        self.store.save(session.sid, session.get('user_id'), dict(session), session.expires_at)
+
+        response.set_cookie(
+            name,
+            self.get_signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_sessions(app, db):
+    with app.app_context():
+        url = db.engine.url
+    # A pool of its own: save_session runs while the request still holds its
+    # db.session connection, so sharing the app's pool deadlocks once every
+    # connection in it belongs to a request waiting to save its session
+    engine = create_engine(url, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    apply_sqlite_pragmas(engine, get_sqlite_pragmas(app.config))
+    watch_pool(app, 'sessions', engine)
+    store = SessionStore(
+        engine,
+        cache_size=app.config.get('SESSION_CACHE_SIZE', 1024),
+        cache_ttl=app.config.get('SESSION_CACHE_TTL', 30),
+    )
+    app.session_interface = ServerSessionInterface(
+        store,
+        renew_interval=app.config.get('SESSION_RENEW_INTERVAL', 300),
+        sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', 600),
+        sweep_batch_size=app.config.get('SESSION_SWEEP_BATCH_SIZE', 500),
+    )
+    app.extensions['session_store'] = store
+
+
+def revoke_user_sessions(app, user_id):
+    return app.extensions['session_store'].revoke_user(user_id)
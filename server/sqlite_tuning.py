@@ -0,0 +1,53 @@
+from sqlalchemy import event
+
+# PRAGMAs applied to every new SQLite connection, by profile name.
+#   journal_mode=WAL    readers no longer block behind a writer (and vice versa)
+#   synchronous=NORMAL  fsync at checkpoints instead of every commit; safe with WAL
+#   mmap_size           read pages through the OS page cache instead of copying them
+#   cache_size          negative values are KiB, so -64000 is ~64 MB of page cache
+#   busy_timeout        wait (ms) for a competing writer instead of failing with
+#                       "database is locked"
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+def get_sqlite_pragmas(config):
+    '''PRAGMAs for the configured SQLITE_PROFILE, with SQLITE_PRAGMAS overriding single values.'''
+    name = config.get('SQLITE_PROFILE', 'default')
+    try:
+        pragmas = dict(SQLITE_PROFILES[name])
+    except KeyError:
+        raise ValueError(f"Unknown SQLite profile: {name}")
+    pragmas.update(config.get('SQLITE_PRAGMAS', {}))
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    '''Run the given PRAGMAs on every connection the engine opens. No-op for other databases.'''
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def init_sqlite_tuning(app, db):
+    pragmas = get_sqlite_pragmas(app.config)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, pragmas)
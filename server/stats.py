@@ -0,0 +1,111 @@
+'''Per-user recipe aggregates stored on the user row.
+
+User.recipe_count, User.timed_recipe_count (recipes that have a duration) and
+User.total_minutes (the sum of minutes_to_complete) are kept current by triggers
+on recipe. Every write path adjusts them in the same statement,
+including ORM flushes, bulk inserts and the async handlers. seed.py suspends the
+insert trigger and recomputes the columns once after loading. Summaries read them
+instead of aggregating the user's recipes.
+
+The triggers are SQLite-only, like the search index. `flask reconcile-stats`
+recomputes the columns from recipe: run it after loading data behind the
+triggers' back, or on other databases.
+'''
+from contextlib import contextmanager
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, func, or_, select, text, update
+
+from models import db, User, Recipe
+from search import drop_stale_connections
+
+# timed_recipe_count counts the recipes that have a minutes_to_complete, so
+# average_minutes matches SQL AVG and ignores recipes without a duration
+STATS_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS recipe_stats_ai AFTER INSERT ON recipe BEGIN "
+    "UPDATE user SET recipe_count = recipe_count + 1, "
+    "timed_recipe_count = timed_recipe_count + (new.minutes_to_complete IS NOT NULL), "
+    "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS recipe_stats_ad AFTER DELETE ON recipe BEGIN "
+    "UPDATE user SET recipe_count = recipe_count - 1, "
+    "timed_recipe_count = timed_recipe_count - (old.minutes_to_complete IS NOT NULL), "
+    "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+    "END",
+    # Also covers a recipe moving to another user
+    "CREATE TRIGGER IF NOT EXISTS recipe_stats_au AFTER UPDATE OF user_id, minutes_to_complete ON recipe BEGIN "
+    "UPDATE user SET recipe_count = recipe_count - 1, "
+    "timed_recipe_count = timed_recipe_count - (old.minutes_to_complete IS NOT NULL), "
+    "total_minutes = total_minutes - coalesce(old.minutes_to_complete, 0) WHERE id = old.user_id; "
+    "UPDATE user SET recipe_count = recipe_count + 1, "
+    "timed_recipe_count = timed_recipe_count + (new.minutes_to_complete IS NOT NULL), "
+    "total_minutes = total_minutes + coalesce(new.minutes_to_complete, 0) WHERE id = new.user_id; "
+    "END",
+]
+
+STATS_DROP = [
+    "DROP TRIGGER IF EXISTS recipe_stats_au",
+    "DROP TRIGGER IF EXISTS recipe_stats_ad",
+    "DROP TRIGGER IF EXISTS recipe_stats_ai",
+]
+
+# Migrations create the triggers for real databases; these cover db.create_all()
+for statement in STATS_TRIGGERS:
+    event.listen(Recipe.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in STATS_DROP:
+    event.listen(Recipe.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+
+def reconcile_user_stats(session):
+    '''Recompute every user's aggregates from recipe; returns how many users had drifted.'''
+    count = select(func.count(Recipe.id)).where(Recipe.user_id == User.id).scalar_subquery()
+    timed = select(func.count(Recipe.minutes_to_complete)).where(Recipe.user_id == User.id).scalar_subquery()
+    total = select(func.coalesce(func.sum(Recipe.minutes_to_complete), 0)) \
+        .where(Recipe.user_id == User.id).scalar_subquery()
+    users = User.__table__
+    result = session.execute(
+        update(users)
+        .where(or_(users.c.recipe_count != count, users.c.timed_recipe_count != timed,
+                   users.c.total_minutes != total))
+        # Repaired users render differently, so their ETags must change too
+        .values(
+            recipe_count=count,
+            timed_recipe_count=timed,
+            total_minutes=total,
+            data_version=users.c.data_version + 1,
+            data_modified_at=func.current_timestamp(),
+        )
+    )
+    return result.rowcount
+
+
+@contextmanager
+def deferred_user_stats(session):
+    '''Bulk-load recipes without the per-row insert trigger, then recompute the aggregates once.'''
+    if session.get_bind().dialect.name != 'sqlite':
+        yield
+        reconcile_user_stats(session)
+        session.commit()
+        return
+
+    session.execute(text("DROP TRIGGER IF EXISTS recipe_stats_ai"))
+    session.commit()
+    drop_stale_connections(session)
+    try:
+        yield
+    finally:
+        session.rollback()
+        reconcile_user_stats(session)
+        session.execute(text(STATS_TRIGGERS[0]))
+        session.commit()
+        drop_stale_connections(session)
+
+
+@click.command('reconcile-stats')
+@with_appcontext
+def reconcile_stats_command():
+    '''Repair users' recipe aggregates from their recipes.'''
+    fixed = reconcile_user_stats(db.session)
+    db.session.commit()
+    click.echo(f"Fixed {fixed} user(s)")
@@ -1,10 +1,13 @@
+import json
 from faker import Faker
 import flask
 import pytest
 from random import randint, choice as rc
+from sqlalchemy import text
 
 from app import app
-from models import db, User, Recipe
+from models import db, User, Recipe, UserSession
+from ratelimit import MemoryBackend, RateLimiter
 
 # Setting a secret key is crucial for session management in tests
 app.secret_key = b'a\xdb\xd2\x13\x93\xc1\xe9\x97\xef2\xe3\x004U\xd1Z'
@@ -188,6 +191,80 @@ class TestLogin:
             with client.session_transaction() as session:
                 assert not session.get('user_id')
 
+    def test_429s_repeated_failures(self):
+        '''returns 429 with Retry-After once a username has too many failed logins.'''
+
+        with app.app_context():
+            User.query.delete()
+            db.session.commit()
+
+        limiter = app.extensions['rate_limiter']
+        app.extensions['rate_limiter'] = RateLimiter(MemoryBackend(), {'username': (2, 60), 'ip': (100, 60)})
+        try:
+            with app.test_client() as client:
+                client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu'})
+
+                for _ in range(2):
+                    response = client.post('/login', json={'username': 'ashketchum', 'password': 'wrong'})
+                    assert response.status_code == 401
+
+                response = client.post('/login', json={'username': 'ashketchum', 'password': 'pikachu'})
+                assert response.status_code == 429
+                assert int(response.headers['Retry-After']) == 30
+
+                response = client.post('/login', json={'username': 'brock', 'password': 'onix'})
+                assert response.status_code == 401
+        finally:
+            app.extensions['rate_limiter'] = limiter
+
+    def test_successful_logins_are_not_limited(self):
+        '''does not count successful logins against the limit.'''
+
+        with app.app_context():
+            User.query.delete()
+            db.session.commit()
+
+        limiter = app.extensions['rate_limiter']
+        app.extensions['rate_limiter'] = RateLimiter(MemoryBackend(), {'username': (1, 60), 'ip': (1, 60)})
+        try:
+            with app.test_client() as client:
+                client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu'})
+
+                for _ in range(3):
+                    response = client.post('/login', json={'username': 'ashketchum', 'password': 'pikachu'})
+                    assert response.status_code == 200
+        finally:
+            app.extensions['rate_limiter'] = limiter
+
+    def test_hashes_without_holding_a_connection(self, monkeypatch):
+        '''returns pooled connections before hashing and saves rehashed passwords afterwards.'''
+
+        with app.app_context():
+            User.query.delete()
+            db.session.commit()
+
+        pool = app.extensions['hashing_pool']
+        checked_out = []
+
+        def run(fn, *args):
+            with app.app_context():
+                checked_out.append(db.engine.pool.checkedout())
+            return pool.submit(fn, *args).result()
+
+        monkeypatch.setattr(pool, 'run', run)
+        with app.test_client() as client:
+            client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu'})
+
+            monkeypatch.setitem(app.config, 'PASSWORD_HASHER', 'bcrypt')
+            monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 4)
+            response = client.post('/login', json={'username': 'ashketchum', 'password': 'pikachu'})
+            assert response.status_code == 200
+
+        assert checked_out == [0, 0]
+        with app.app_context():
+            user = User.query.filter_by(username='ashketchum').one()
+            assert user.password_hash.startswith('$2b$04$')
+
 class TestLogout:
     '''Logout resource in app.py'''
 
@@ -226,6 +303,67 @@ class TestLogout:
 
             assert response.status_code == 401
 
+class TestServerSessions:
+    '''Server-side sessions in sessions.py and DELETE /sessions in app.py'''
+
+    def setup_method(self):
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            UserSession.query.delete()
+            db.session.commit()
+
+    def test_rotates_session_id_on_login(self):
+        '''stores session data server-side and rotates the id on login.'''
+
+        with app.test_client() as client:
+            client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu'})
+            with client.session_transaction() as session:
+                signup_sid = session.sid
+                user_id = session['user_id']
+
+            client.post('/login', json={'username': 'ashketchum', 'password': 'pikachu'})
+            with client.session_transaction() as session:
+                assert session['user_id'] == user_id
+                assert session.sid != signup_sid
+
+            with app.app_context():
+                assert db.session.get(UserSession, signup_sid) is None
+                row = db.session.get(UserSession, session.sid)
+                assert row.user_id == user_id
+
+    def test_logout_deletes_session(self):
+        '''removes the session row on logout.'''
+
+        with app.test_client() as client:
+            client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu'})
+            client.delete('/logout')
+
+            with app.app_context():
+                assert UserSession.query.count() == 0
+            assert client.get('/check-session').status_code == 401
+
+    def test_revokes_all_sessions(self):
+        '''logs every client of the user out at DELETE /sessions.'''
+
+        phone, laptop, other = app.test_client(), app.test_client(), app.test_client()
+        phone.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu'})
+        laptop.post('/login', json={'username': 'ashketchum', 'password': 'pikachu'})
+        other.post('/signup', json={'username': 'misty', 'password': 'staryu'})
+
+        response = phone.delete('/sessions')
+        assert response.status_code == 204
+
+        assert phone.get('/check-session').status_code == 401
+        assert laptop.get('/check-session').status_code == 401
+        assert other.get('/check-session').status_code == 200
+
+    def test_revoke_requires_login(self):
+        '''returns 401 at DELETE /sessions without a session.'''
+
+        with app.test_client() as client:
+            assert client.delete('/sessions').status_code == 401
+
 class TestRecipeIndex:
     '''RecipeIndex resource in app.py'''
 
@@ -403,3 +541,832 @@ class TestRecipeIndex:
             })
 
             assert response.status_code == 422
+
+            # Wrong types for the text fields and a body that isn't an object
+            response = client.post('/recipes', json={
+                'title': 5,
+                'instructions': fake.paragraph(nb_sentences=8),
+                'minutes_to_complete': randint(15,90)
+            })
+
+            assert response.status_code == 422
+            assert response.get_json() == {"errors": ["title must be a string"]}
+
+            response = client.post('/recipes', json=['not', 'an', 'object'])
+
+            assert response.status_code == 422
+
+
+class TestRecipePagination:
+    '''Paginated and streamed RecipeIndex in app.py'''
+
+    def seed_recipes(self, count):
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            fake = Faker()
+
+            user = User(username="Slagathor", bio=fake.paragraph(nb_sentences=3))
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+            db.session.add_all([
+                Recipe(
+                    title=fake.sentence(),
+                    instructions=fake.paragraph(nb_sentences=8) + ' ' * 50,
+                    minutes_to_complete=randint(15, 90),
+                    user_id=user.id,
+                ) for i in range(count)
+            ])
+            db.session.commit()
+
+    def test_pages_with_keyset_cursor(self):
+        '''returns pages of recipes and a cursor for the next page with ?limit= and ?after=.'''
+
+        self.seed_recipes(5)
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            first = client.get('/recipes?limit=2')
+            assert first.status_code == 200
+            assert len(first.get_json()) == 2
+
+            cursor = first.headers['X-Next-Cursor']
+            assert int(cursor) == first.get_json()[-1]['id']
+
+            second = client.get(f'/recipes?limit=2&after={cursor}')
+            assert [r['id'] for r in second.get_json()] == \
+                [first.get_json()[-1]['id'] + 1, first.get_json()[-1]['id'] + 2]
+
+            last = client.get(f"/recipes?limit=2&after={second.headers['X-Next-Cursor']}")
+            assert len(last.get_json()) == 1
+            assert 'X-Next-Cursor' not in last.headers
+
+    def test_422s_invalid_limit(self):
+        '''returns a 422 for a malformed or out of range ?limit=.'''
+
+        self.seed_recipes(1)
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            assert client.get('/recipes?limit=abc').status_code == 422
+            assert client.get('/recipes?limit=0').status_code == 422
+
+    def test_streams_recipes(self):
+        '''streams the full recipe list as a JSON array with ?stream=1.'''
+
+        self.seed_recipes(12)
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            response = client.get('/recipes?stream=1')
+
+            assert response.status_code == 200
+            assert response.is_streamed
+            assert len(response.get_json()) == 12
+
+
+class TestUserSummary:
+    '''User summary serialization on auth endpoints in app.py'''
+
+    def test_check_session_returns_summary(self):
+        '''returns a recipe_count instead of the recipe list unless ?include=recipes is passed.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+            db.session.add(Recipe(
+                title="Delicious Shed Ham",
+                instructions="Or kind rest bred with am shed then. In raptures building an bringing be.",
+                minutes_to_complete=60,
+                user_id=user.id,
+            ))
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            summary = client.get('/check-session').get_json()
+            assert summary['recipe_count'] == 1
+            assert 'recipes' not in summary
+
+            full = client.get('/check-session?include=recipes').get_json()
+            assert len(full['recipes']) == 1
+            assert full['recipes'][0]['title'] == "Delicious Shed Ham"
+
+
+class TestRecipeBulkCreate:
+    '''Bulk recipe creation in app.py'''
+
+    def login(self, client):
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+        client.post('/login', json={
+            'username': 'Slagathor',
+            'password': 'secret',
+        })
+
+    def test_creates_valid_and_reports_invalid(self):
+        '''inserts valid recipes from a JSON array and reports invalid ones by index.'''
+
+        fake = Faker()
+        instructions = fake.paragraph(nb_sentences=8) + ' ' * 50
+
+        with app.test_client() as client:
+
+            self.login(client)
+
+            response = client.post('/recipes/bulk', json=[
+                {'title': 'Pancakes', 'instructions': instructions, 'minutes_to_complete': 15},
+                {'title': 'Salad', 'instructions': 'too short', 'minutes_to_complete': 10},
+                {'title': 'Spaghetti', 'instructions': instructions, 'minutes_to_complete': 'soon'},
+                {'title': 'Toast', 'instructions': instructions, 'minutes_to_complete': 5},
+            ])
+
+            assert response.status_code == 201
+            assert response.get_json()['created'] == 2
+            assert [e['index'] for e in response.get_json()['errors']] == [1, 2]
+
+            with app.app_context():
+                titles = {r.title for r in Recipe.query.all()}
+                assert titles == {'Pancakes', 'Toast'}
+
+    def test_accepts_ndjson(self):
+        '''inserts recipes from an NDJSON body.'''
+
+        fake = Faker()
+        lines = [
+            json.dumps({
+                'title': fake.sentence(),
+                'instructions': fake.paragraph(nb_sentences=8) + ' ' * 50,
+                'minutes_to_complete': randint(15, 90),
+            }) for i in range(25)
+        ]
+
+        with app.test_client() as client:
+
+            self.login(client)
+
+            response = client.post(
+                '/recipes/bulk',
+                data='\n'.join(lines) + '\n',
+                content_type='application/x-ndjson',
+            )
+
+            assert response.status_code == 201
+            assert response.get_json() == {'created': 25, 'errors': []}
+
+    def test_422s_without_valid_recipes(self):
+        '''returns 422 when the body is not an array or no recipe is valid.'''
+
+        with app.test_client() as client:
+
+            self.login(client)
+
+            assert client.post('/recipes/bulk', json={'title': 'Pancakes'}).status_code == 422
+            assert client.post('/recipes/bulk', json=[{'title': 'Pancakes'}]).status_code == 422
+
+    def test_reports_wrong_types(self):
+        '''reports non-string titles and instructions by index instead of failing the request.'''
+
+        fake = Faker()
+        instructions = fake.paragraph(nb_sentences=8) + ' ' * 50
+
+        with app.test_client() as client:
+
+            self.login(client)
+
+            response = client.post('/recipes/bulk', json=[
+                {'title': 5, 'instructions': instructions, 'minutes_to_complete': 15},
+                {'title': 'Salad', 'instructions': ['chop'] * 60, 'minutes_to_complete': 10},
+                {'title': 'Toast', 'instructions': instructions, 'minutes_to_complete': [5]},
+                {'title': 'Pancakes', 'instructions': instructions, 'minutes_to_complete': 15},
+            ])
+
+            assert response.status_code == 201
+            body = response.get_json()
+            assert body['created'] == 1
+            assert [e['index'] for e in body['errors']] == [0, 1, 2]
+            assert body['errors'][1]['errors'] == ['instructions must be a string']
+
+    def test_reports_malformed_ndjson_lines(self):
+        '''reports an NDJSON line that isn't JSON by index and keeps the valid ones.'''
+
+        fake = Faker()
+        line = json.dumps({
+            'title': 'Pancakes',
+            'instructions': fake.paragraph(nb_sentences=8) + ' ' * 50,
+            'minutes_to_complete': 15,
+        })
+
+        with app.test_client() as client:
+
+            self.login(client)
+
+            response = client.post(
+                '/recipes/bulk',
+                data='\n'.join([line, '{"title": "Toast", ', line]) + '\n',
+                content_type='application/x-ndjson',
+            )
+
+            assert response.status_code == 201
+            assert response.get_json() == {
+                'created': 2,
+                'errors': [{'index': 1, 'errors': ['Line is not valid JSON']}],
+            }
+
+    def test_hides_database_errors(self, monkeypatch):
+        '''returns a 500 without the failed SQL or its parameters.'''
+
+        import resources
+        from sqlalchemy.exc import OperationalError
+
+        def fail(connection, user_id):
+            raise OperationalError("UPDATE user SET data_version = ?", (user_id,), Exception("disk I/O error"))
+
+        monkeypatch.setattr(resources, 'bump_data_version', fail)
+        instructions = Faker().paragraph(nb_sentences=8) + ' ' * 50
+
+        with app.test_client() as client:
+
+            self.login(client)
+
+            response = client.post('/recipes/bulk', json=[
+                {'title': 'Pancakes', 'instructions': instructions, 'minutes_to_complete': 15},
+            ])
+
+            assert response.status_code == 500
+            assert response.get_json() == {'errors': ['An unexpected error occurred']}
+            with app.app_context():
+                assert Recipe.query.count() == 0
+
+
+class TestRecipeUpdateDelete:
+    '''PATCH and DELETE /recipes/<id> in app.py'''
+
+    INSTRUCTIONS = 'Whisk the eggs, fold in the flour and fry in butter until golden on both sides.'
+
+    def setup_method(self):
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+    def create(self, client, username='ashketchum'):
+        client.post('/signup', json={'username': username, 'password': 'pikachu'})
+        response = client.post('/recipes', json={
+            'title': 'Pancakes', 'instructions': self.INSTRUCTIONS, 'minutes_to_complete': 20,
+        })
+        return response.get_json()
+
+    def test_updates_only_given_fields(self):
+        '''applies a partial update and bumps the version.'''
+
+        with app.test_client() as client:
+            recipe = self.create(client)
+            assert recipe['version'] == 1
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'title': 'Crepes'},
+                                    headers={'If-Match': '"1"'})
+
+            assert response.status_code == 200
+            assert response.headers['ETag'] == '"2"'
+            updated = response.get_json()
+            assert updated['title'] == 'Crepes'
+            assert updated['instructions'] == self.INSTRUCTIONS
+            assert updated['minutes_to_complete'] == 20
+            assert updated['version'] == 2
+
+    def test_412s_stale_version(self):
+        '''refuses an update based on an old version and returns the current recipe.'''
+
+        with app.test_client() as client:
+            recipe = self.create(client)
+            client.patch(f"/recipes/{recipe['id']}", json={'title': 'Crepes', 'version': 1})
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'title': 'Waffles', 'version': 1})
+
+            assert response.status_code == 412
+            assert response.get_json()['title'] == 'Crepes'
+            assert response.get_json()['version'] == 2
+
+    def test_428s_without_version(self):
+        '''requires the version being updated.'''
+
+        with app.test_client() as client:
+            recipe = self.create(client)
+            response = client.patch(f"/recipes/{recipe['id']}", json={'title': 'Crepes'})
+            assert response.status_code == 428
+
+    def test_422s_invalid_update(self):
+        '''runs the model validators and rejects unknown fields.'''
+
+        with app.test_client() as client:
+            recipe = self.create(client)
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'instructions': 'short', 'version': 1})
+            assert response.status_code == 422
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'user_id': 99, 'version': 1})
+            assert response.status_code == 422
+
+            with app.app_context():
+                assert db.session.get(Recipe, recipe['id']).version == 1
+
+    def test_422s_wrong_types(self):
+        '''rejects wrongly typed fields: non-string text, null minutes and a boolean version.'''
+
+        with app.test_client() as client:
+            recipe = self.create(client)
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'instructions': 12345, 'version': 1})
+            assert response.status_code == 422
+            assert response.get_json()['errors'] == ['instructions must be a string']
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'title': ['Crepes'] * 60, 'version': 1})
+            assert response.status_code == 422
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'minutes_to_complete': None, 'version': 1})
+            assert response.status_code == 422
+
+            response = client.patch(f"/recipes/{recipe['id']}", json={'title': 'Crepes', 'version': True})
+            assert response.status_code == 422
+
+            with app.app_context():
+                assert db.session.get(Recipe, recipe['id']).version == 1
+
+    def test_checks_ownership(self):
+        '''only lets the owner update or delete a recipe.'''
+
+        owner, intruder = app.test_client(), app.test_client()
+        recipe = self.create(owner)
+        intruder.post('/signup', json={'username': 'misty', 'password': 'staryu'})
+
+        assert intruder.patch(f"/recipes/{recipe['id']}", json={'title': 'Mine', 'version': 1}).status_code == 403
+        assert intruder.delete(f"/recipes/{recipe['id']}").status_code == 403
+        assert app.test_client().delete(f"/recipes/{recipe['id']}").status_code == 401
+        assert owner.delete('/recipes/999999').status_code == 404
+
+    def test_deletes_recipe(self):
+        '''deletes a recipe, refusing a stale If-Match.'''
+
+        with app.test_client() as client:
+            recipe = self.create(client)
+
+            response = client.delete(f"/recipes/{recipe['id']}", headers={'If-Match': '"7"'})
+            assert response.status_code == 412
+
+            response = client.delete(f"/recipes/{recipe['id']}", headers={'If-Match': '"1"'})
+            assert response.status_code == 204
+            with app.app_context():
+                assert db.session.get(Recipe, recipe['id']) is None
+
+class TestInstrumentation:
+    '''Request timing and /metrics in instrumentation.py'''
+
+    def test_reports_timings_when_enabled(self):
+        '''adds Server-Timing headers and exposes per-endpoint totals at /metrics.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+        app.config['INSTRUMENTATION_ENABLED'] = True
+        try:
+            with app.test_client() as client:
+
+                client.post('/signup', json={
+                    'username': 'ashketchum',
+                    'password': 'pikachu',
+                })
+
+                response = client.get('/check-session')
+                timing = response.headers['Server-Timing']
+                assert timing.startswith('app;dur=')
+                assert 'db;dur=' in timing and 'queries"' in timing
+
+                metrics = client.get('/metrics')
+                body = metrics.get_data(as_text=True)
+
+                assert metrics.status_code == 200
+                assert 'http_requests_total{endpoint="/signup",method="POST",status="201"} 1' in body
+                assert 'db_queries_total{endpoint="/check-session"}' in body
+                assert 'password_hash_duration_seconds_total{endpoint="/signup"}' in body
+        finally:
+            app.config['INSTRUMENTATION_ENABLED'] = False
+
+    def test_disabled_by_default(self):
+        '''adds no headers and hides /metrics unless enabled.'''
+
+        with app.test_client() as client:
+
+            assert 'Server-Timing' not in client.get('/check-session').headers
+            assert client.get('/metrics').status_code == 404
+
+
+class TestConditionalGet:
+    '''ETag and Last-Modified support in app.py'''
+
+    def test_304s_until_recipes_change(self):
+        '''returns 304 for a matching If-None-Match until the user's recipes change.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+        fake = Faker()
+        instructions = fake.paragraph(nb_sentences=8) + ' ' * 50
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            first = client.get('/recipes')
+            etag = first.headers['ETag']
+            assert first.headers['Last-Modified']
+
+            cached = client.get('/recipes', headers={'If-None-Match': etag})
+            assert cached.status_code == 304
+            assert cached.headers['ETag'] == etag
+
+            # Other representations of the same data get their own tags
+            assert client.get('/recipes?limit=5').headers['ETag'] != etag
+
+            client.post('/recipes', json={
+                'title': fake.sentence(),
+                'instructions': instructions,
+                'minutes_to_complete': 30,
+            })
+
+            changed = client.get('/recipes', headers={'If-None-Match': etag})
+            assert changed.status_code == 200
+            assert len(changed.get_json()) == 1
+            assert changed.headers['ETag'] != etag
+
+    def test_check_session_revalidates(self):
+        '''returns 304 from /check-session until the user's data changes.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+        fake = Faker()
+
+        with app.test_client() as client:
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+
+            etag = client.get('/check-session').headers['ETag']
+            assert client.get('/check-session', headers={'If-None-Match': etag}).status_code == 304
+
+            client.post('/recipes/bulk', json=[{
+                'title': fake.sentence(),
+                'instructions': fake.paragraph(nb_sentences=8) + ' ' * 50,
+                'minutes_to_complete': 30,
+            }])
+
+            response = client.get('/check-session', headers={'If-None-Match': etag})
+            assert response.status_code == 200
+            assert response.get_json()['recipe_count'] == 1
+
+    def test_check_session_renders_the_tagged_version(self):
+        '''never sends a cached user's stale counts under a newer ETag.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/signup', json={
+                'username': 'ashketchum',
+                'password': 'pikachu',
+            })
+            first = client.get('/check-session')
+            assert first.get_json()['recipe_count'] == 0
+
+            # Another worker writes: this process's user cache never hears of it
+            with app.app_context():
+                with db.engine.begin() as conn:
+                    user_id = conn.execute(text("SELECT id FROM user")).scalar()
+                    conn.execute(text(
+                        "INSERT INTO recipe (title, instructions, minutes_to_complete, user_id, version) "
+                        "VALUES ('Stew', :instructions, 30, :user_id, 1)"
+                    ), {'instructions': 'Simmer it. ' * 10, 'user_id': user_id})
+                    conn.execute(text("UPDATE user SET data_version = data_version + 1 WHERE id = :id"), {'id': user_id})
+
+            changed = client.get('/check-session', headers={'If-None-Match': first.headers['ETag']})
+            assert changed.status_code == 200
+            assert changed.get_json()['recipe_count'] == 1
+
+            again = client.get('/check-session', headers={'If-None-Match': changed.headers['ETag']})
+            assert again.status_code == 304
+            assert client.get('/check-session').get_json()['recipe_count'] == 1
+
+
+class TestRecipeSearch:
+    '''Full-text recipe search in app.py'''
+
+    def test_ranks_and_pages_matches(self):
+        '''returns the user's matching recipes, best match first, in pages.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            other = User(username="Prabhdip")
+            other.password_hash = 'secret'
+            db.session.add_all([user, other])
+            db.session.commit()
+
+            filler = " Stir occasionally and season to taste before serving it warm."
+            db.session.add_all([
+                Recipe(title="Tomato Soup", instructions="Simmer tomatoes with garlic." + filler,
+                       minutes_to_complete=30, user_id=user.id),
+                Recipe(title="Garlic Bread", instructions="Bake bread with butter and one tomato slice." + filler,
+                       minutes_to_complete=15, user_id=user.id),
+                Recipe(title="Pancakes", instructions="Whisk flour, eggs and milk, then fry." + filler,
+                       minutes_to_complete=20, user_id=user.id),
+                Recipe(title="Tomato Salad", instructions="Slice tomatoes and dress them." + filler,
+                       minutes_to_complete=10, user_id=other.id),
+            ])
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            response = client.get('/recipes/search?q=tomato')
+            assert response.status_code == 200
+            assert [r['title'] for r in response.get_json()] == ["Tomato Soup", "Garlic Bread"]
+
+            prefix = client.get('/recipes/search?q=panc*')
+            assert [r['title'] for r in prefix.get_json()] == ["Pancakes"]
+
+            first = client.get('/recipes/search?q=tomato&limit=1')
+            assert [r['title'] for r in first.get_json()] == ["Tomato Soup"]
+            second = client.get(f"/recipes/search?q=tomato&limit=1&offset={first.headers['X-Next-Offset']}")
+            assert [r['title'] for r in second.get_json()] == ["Garlic Bread"]
+            assert 'X-Next-Offset' not in second.headers
+
+    def test_422s_empty_queries(self):
+        '''returns 422 when the query has no searchable words.'''
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            db.session.add(user)
+            db.session.commit()
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            assert client.get('/recipes/search?q=%22%28%29').status_code == 422
+
+    def test_scopes_matches_to_owner(self):
+        '''matches only the user's recipes, follows ownership changes and never matches the owner token.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Slagathor")
+            user.password_hash = 'secret'
+            other = User(username="Prabhdip")
+            other.password_hash = 'secret'
+            db.session.add_all([user, other])
+            db.session.commit()
+
+            filler = " Stir occasionally and season to taste before serving it warm."
+            soup = Recipe(title="Tomato Soup", instructions="Simmer tomatoes with garlic." + filler,
+                          minutes_to_complete=30, user_id=other.id)
+            db.session.add_all([
+                soup,
+                Recipe(title=f"Tomato u{user.id}", instructions="Slice tomatoes and dress them." + filler,
+                       minutes_to_complete=10, user_id=other.id),
+            ])
+            db.session.commit()
+            user_id, soup_id = user.id, soup.id
+
+        with app.test_client() as client:
+
+            client.post('/login', json={
+                'username': 'Slagathor',
+                'password': 'secret',
+            })
+
+            assert client.get('/recipes/search?q=tomato').get_json() == []
+            assert client.get(f'/recipes/search?q=u{user_id}').get_json() == []
+
+            with app.app_context():
+                db.session.get(Recipe, soup_id).user_id = user_id
+                db.session.commit()
+
+            assert [r['title'] for r in client.get('/recipes/search?q=tom*').get_json()] == ["Tomato Soup"]
+
+
+class TestFeed:
+    '''Public recipe feed in app.py'''
+
+    def seed(self):
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            ash = User(username="ashketchum")
+            ash.password_hash = 'pikachu'
+            misty = User(username="misty")
+            misty.password_hash = 'togepi'
+            db.session.add_all([ash, misty])
+            db.session.commit()
+
+            instructions = "Mix ingredients thoroughly and cook on a hot griddle until golden brown."
+            for minutes, owner in [(30, ash), (10, misty), (45, ash), (10, ash), (60, misty)]:
+                db.session.add(Recipe(
+                    title=f"{minutes} minute meal",
+                    instructions=instructions,
+                    minutes_to_complete=minutes,
+                    user_id=owner.id,
+                ))
+                db.session.commit()
+            return ash.id
+
+    def walk(self, client, url):
+        results = []
+        response = client.get(url)
+        while True:
+            results += response.get_json()
+            if 'X-Next-Cursor' not in response.headers:
+                return results
+            response = client.get(f"{url}&after={response.headers['X-Next-Cursor']}")
+
+    def test_pages_newest_first(self):
+        '''lists every user's recipes newest first without logging in.'''
+
+        self.seed()
+
+        with app.test_client() as client:
+
+            recipes = self.walk(client, '/feed?limit=2')
+            ids = [r['id'] for r in recipes]
+
+            assert len(ids) == 5
+            assert ids == sorted(ids, reverse=True)
+
+    def test_filters_and_sorts_quickest(self):
+        '''filters by duration and author and pages quickest first.'''
+
+        ash_id = self.seed()
+
+        with app.test_client() as client:
+
+            quickest = self.walk(client, '/feed?sort=quickest&limit=2&max_minutes=45')
+            assert [r['minutes_to_complete'] for r in quickest] == [10, 10, 30, 45]
+
+            ash = self.walk(client, f'/feed?sort=quickest&limit=1&author_id={ash_id}&min_minutes=20')
+            assert [r['minutes_to_complete'] for r in ash] == [30, 45]
+
+    def test_422s_bad_parameters(self):
+        '''returns 422 for unknown sorts and malformed cursors.'''
+
+        with app.test_client() as client:
+
+            assert client.get('/feed?sort=tastiest').status_code == 422
+            assert client.get('/feed?sort=quickest&after=12').status_code == 422
+
+class TestUserLookup:
+    '''Public profile lookup in app.py'''
+
+    def seed(self):
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            ash = User(username="ashketchum", bio="Pallet Town")
+            ash.password_hash = 'pikachu'
+            misty = User(username="misty", bio="Cerulean City")
+            misty.password_hash = 'togepi'
+            db.session.add_all([ash, misty])
+            db.session.commit()
+            return ash.id, misty.id
+
+    def test_returns_public_profiles(self):
+        '''returns the requested users' public fields in order, skipping unknown ids.'''
+
+        ash_id, misty_id = self.seed()
+
+        with app.test_client() as client:
+
+            response = client.get(f'/users?ids={misty_id},{ash_id + misty_id},{ash_id},{misty_id}')
+            assert response.status_code == 200
+            users = response.get_json()
+            assert [u['username'] for u in users] == ["misty", "ashketchum"]
+            assert set(users[0]) == {'id', 'username', 'image_url', 'bio'}
+            assert users[1]['bio'] == "Pallet Town"
+
+    def test_reflects_updates(self):
+        '''serves a changed profile after the user is updated.'''
+
+        ash_id, _ = self.seed()
+
+        with app.test_client() as client:
+
+            assert client.get(f'/users?ids={ash_id}').get_json()[0]['bio'] == "Pallet Town"
+
+            with app.app_context():
+                db.session.get(User, ash_id).bio = "Indigo Plateau"
+                db.session.commit()
+
+            assert client.get(f'/users?ids={ash_id}').get_json()[0]['bio'] == "Indigo Plateau"
+
+    def test_422s_bad_ids(self):
+        '''returns 422 for missing, malformed or too many ids.'''
+
+        too_many = ','.join(str(i) for i in range(1, app.config['USER_LOOKUP_MAX_IDS'] + 2))
+
+        with app.test_client() as client:
+
+            assert client.get('/users').status_code == 422
+            assert client.get('/users?ids=1,two').status_code == 422
+            assert client.get('/users?ids=0').status_code == 422
+            assert client.get(f'/users?ids={too_many}').status_code == 422
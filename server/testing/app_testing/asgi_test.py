@@ -0,0 +1,179 @@
+import asyncio
+import json
+from http.cookies import SimpleCookie
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+from app import app
+from models import db, User, Recipe
+from asgi import application, engine
+
+# One loop for every request: the async engine's pooled connections belong to the loop they opened on
+loop = asyncio.new_event_loop()
+
+def teardown_module():
+    # aiosqlite connections run on non-daemon threads that would keep pytest from exiting
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+INSTRUCTIONS = 'Whisk the eggs, fold in the flour and fry in butter until golden on both sides.'
+
+class ASGIClient:
+    '''Calls the ASGI application directly, keeping cookies between requests.'''
+
+    def __init__(self):
+        self.cookies = {}
+
+    def request(self, method, path, body=None, headers=None):
+        path, _, query = path.partition('?')
+        raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        payload = b''
+        if body is not None:
+            payload = json.dumps(body).encode()
+            raw_headers.append((b'content-type', b'application/json'))
+        if self.cookies:
+            cookie = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+            raw_headers.append((b'cookie', cookie.encode()))
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+            'path': path, 'query_string': query.encode(), 'root_path': '',
+            'headers': raw_headers, 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        loop.run_until_complete(application(scope, receive, send))
+
+        start = sent[0]
+        response_headers = {}
+        for name, value in start['headers']:
+            name, value = name.decode(), value.decode()
+            if name == 'set-cookie':
+                cookie = SimpleCookie(value)
+                for key, morsel in cookie.items():
+                    if morsel['expires'] and 'Thu, 01 Jan 1970' in morsel['expires']:
+                        self.cookies.pop(key, None)
+                    else:
+                        self.cookies[key] = morsel.value
+            response_headers[name] = value
+        content = b''.join(m.get('body', b'') for m in sent[1:])
+        return start['status'], response_headers, json.loads(content) if content else None
+
+class TestASGI:
+    '''Async handlers in asgi.py'''
+
+    def setup_method(self):
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+    def test_signup_login_logout(self):
+        '''signs up, logs in and out through the async auth handlers.'''
+
+        client = ASGIClient()
+        status, _, body = client.request('POST', '/signup', {'username': 'ashketchum', 'password': 'pikachu'})
+        assert status == 201
+        assert body['username'] == 'ashketchum'
+        assert body['recipe_count'] == 0
+
+        status, _, body = client.request('GET', '/check-session')
+        assert status == 200
+        assert body['username'] == 'ashketchum'
+
+        assert client.request('DELETE', '/logout')[0] == 204
+        assert client.request('GET', '/check-session')[0] == 401
+
+        status, _, _ = client.request('POST', '/login', {'username': 'ashketchum', 'password': 'wrong'})
+        assert status == 401
+        status, _, body = client.request('POST', '/login', {'username': 'ashketchum', 'password': 'pikachu'})
+        assert status == 200
+        assert client.request('GET', '/check-session')[0] == 200
+
+    def test_hashes_without_holding_a_connection(self, monkeypatch):
+        '''closes its database session before hashing and saves rehashed passwords afterwards.'''
+
+        pool = app.extensions['hashing_pool']
+        checked_out = []
+
+        async def run_async(fn, *args):
+            checked_out.append(engine.pool.checkedout())
+            with app.app_context():
+                return fn(*args)
+
+        monkeypatch.setattr(pool, 'run_async', run_async)
+        client = ASGIClient()
+        assert client.request('POST', '/signup', {'username': 'ashketchum', 'password': 'pikachu'})[0] == 201
+
+        monkeypatch.setitem(app.config, 'PASSWORD_HASHER', 'bcrypt')
+        monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 4)
+        status, _, body = client.request('POST', '/login', {'username': 'ashketchum', 'password': 'pikachu'})
+        assert status == 200
+        assert body['username'] == 'ashketchum'
+
+        assert checked_out == [0, 0]
+        with app.app_context():
+            user = User.query.filter_by(username='ashketchum').one()
+            assert user.password_hash.startswith('$2b$04$')
+
+    def test_sessions_are_shared_with_flask(self):
+        '''uses the same server-side sessions as the Flask app.'''
+
+        client = ASGIClient()
+        client.request('POST', '/signup', {'username': 'ashketchum', 'password': 'pikachu'})
+
+        with app.test_client() as flask_client:
+            flask_client.set_cookie('localhost', 'session', client.cookies['session'])
+            response = flask_client.get('/check-session')
+            assert response.status_code == 200
+            assert response.get_json()['username'] == 'ashketchum'
+
+    def test_creates_and_lists_recipes(self):
+        '''creates recipes and pages through them with conditional GET support.'''
+
+        client = ASGIClient()
+        client.request('POST', '/signup', {'username': 'ashketchum', 'password': 'pikachu'})
+        for title in ('Pancakes', 'Crepes', 'Waffles'):
+            status, headers, body = client.request('POST', '/recipes', {
+                'title': title, 'instructions': INSTRUCTIONS, 'minutes_to_complete': 20})
+            assert status == 201
+            assert body['version'] == 1
+            assert headers['etag'] == '"1"'
+
+        status, _, body = client.request('POST', '/recipes', {'title': 'Toast', 'instructions': 'short'})
+        assert status == 422
+        status, _, body = client.request('POST', '/recipes', {
+            'title': 5, 'instructions': INSTRUCTIONS, 'minutes_to_complete': 20})
+        assert status == 422
+        assert body == {'errors': ['title must be a string']}
+
+        status, headers, body = client.request('GET', '/recipes?limit=2')
+        assert status == 200
+        assert [r['title'] for r in body] == ['Pancakes', 'Crepes']
+        assert headers['x-next-cursor'] == str(body[-1]['id'])
+
+        status, _, _ = client.request('GET', '/recipes?limit=2', headers={'If-None-Match': headers['etag']})
+        assert status == 304
+
+    def test_falls_back_to_flask(self):
+        '''serves routes without an async handler through the Flask app.'''
+
+        client = ASGIClient()
+        client.request('POST', '/signup', {'username': 'ashketchum', 'password': 'pikachu'})
+        client.request('POST', '/recipes', {'title': 'Pancakes', 'instructions': INSTRUCTIONS, 'minutes_to_complete': 20})
+
+        status, _, body = client.request('GET', '/recipes?stream=1')
+        assert status == 200
+        assert [r['title'] for r in body] == ['Pancakes']
+
+        status, _, body = client.request('GET', '/feed')
+        assert status == 200
+        assert [r['title'] for r in body] == ['Pancakes']
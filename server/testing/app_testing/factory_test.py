@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+from app import app, create_app
+from config import Config
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class TestAppFactory:
+    '''create_app() in app.py'''
+
+    def test_builds_independent_apps(self):
+        '''builds a new app from a config class without touching the module-level app.'''
+
+        class SmallPages(Config):
+            MAX_PAGE_SIZE = 5
+
+        small = create_app(SmallPages)
+        assert small is not app
+        assert small.config['MAX_PAGE_SIZE'] == 5
+        assert app.config['MAX_PAGE_SIZE'] == 1000
+
+        with small.test_client() as client:
+            assert client.get('/feed?limit=6').status_code == 422
+            assert client.get('/feed?limit=5').status_code == 200
+
+    def test_registers_each_route_once(self):
+        '''registers every resource URL exactly once.'''
+
+        rules = [rule.rule for rule in app.url_map.iter_rules() if rule.endpoint != 'static']
+        assert len(rules) == len(set(rules))
+        assert {'/signup', '/login', '/logout', '/sessions', '/check-session', '/recipes',
+                '/recipes/search', '/feed', '/recipes/<int:recipe_id>', '/recipes/bulk'} <= set(rules)
+
+    def test_imports_cli_only_modules_lazily(self):
+        '''does not import alembic or Faker until a CLI command needs them.'''
+
+        loaded = subprocess.run(
+            [sys.executable, '-c',
+             "import sys, app; print(' '.join(m for m in ('flask_migrate', 'alembic', 'faker') if m in sys.modules))"],
+            cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        assert loaded == ''
+
+        result = app.test_cli_runner().invoke(args=['db', '--help'])
+        assert result.exit_code == 0
+        assert 'upgrade' in result.output
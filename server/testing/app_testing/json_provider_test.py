@@ -0,0 +1,44 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app import app
+import json_provider
+
+PAYLOAD = {
+    "id": 1,
+    "title": "Crème brûlée",
+    "minutes_to_complete": 45,
+    "made_at": datetime(2026, 10, 18, 12, 30),
+    "tags": ["dessert", None],
+}
+
+class TestFastJSONProvider:
+    '''FastJSONProvider in json_provider.py'''
+
+    @pytest.mark.parametrize('backend', ['orjson', 'json'])
+    def test_compact_responses(self, backend):
+        '''writes compact JSON that decodes to the same data with either backend.'''
+
+        if backend == 'orjson' and json_provider.orjson is None:
+            pytest.skip('orjson is not installed')
+
+        app.config['JSON_BACKEND'] = backend
+        try:
+            with app.app_context():
+                body = app.json.response(PAYLOAD).get_data()
+        finally:
+            app.config['JSON_BACKEND'] = 'orjson'
+
+        assert b'\n ' not in body and b'": ' not in body
+        decoded = json.loads(body)
+        assert decoded["title"] == "Crème brûlée"
+        # Dates keep Flask's HTTP date format
+        assert decoded["made_at"] == "Sun, 18 Oct 2026 12:30:00 GMT"
+
+    def test_falls_back_for_unsupported_values(self):
+        '''falls back to the stdlib encoder for values orjson rejects.'''
+
+        with app.app_context():
+            assert app.json.dumps({"big": 2 ** 70}) == '{"big":1180591620717411303424}'
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app import create_app
+from config import Config
+from models import db
+from pooling import TimedPoolMixin, engine_options
+
+class TestEngineOptions:
+    '''engine_options() in pooling.py'''
+
+    def test_maps_pool_settings(self):
+        '''turns DB_POOL_* settings into create_engine() arguments for the chosen pool class.'''
+
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///pool.sqlite3',
+            'DB_POOL_SIZE': 3, 'DB_POOL_MAX_OVERFLOW': 0, 'DB_POOL_TIMEOUT': 2,
+            'DB_POOL_RECYCLE': 600, 'DB_POOL_PRE_PING': True,
+        })
+        assert issubclass(options.pop('poolclass'), QueuePool)
+        assert options == {'pool_size': 3, 'max_overflow': 0, 'pool_timeout': 2,
+                           'pool_recycle': 600, 'pool_pre_ping': True}
+
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///pool.sqlite3',
+            'DB_POOL_CLASS': 'null', 'DB_POOL_SIZE': 3,
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_recycle': 60},
+        })
+        # QueuePool-only settings are dropped, explicit engine options win
+        assert issubclass(options.pop('poolclass'), NullPool)
+        assert options == {'pool_recycle': 60}
+
+        with pytest.raises(ValueError):
+            engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'DB_POOL_CLASS': 'bogus'})
+
+class TestPoolMetrics:
+    '''Pool metrics in pooling.py'''
+
+    def test_reports_pool_usage(self):
+        '''configures the engines' pools and reports their checkouts at /metrics.'''
+
+        class PoolConfig(Config):
+            DB_POOL_SIZE = 2
+            DB_POOL_MAX_OVERFLOW = 1
+            INSTRUMENTATION_ENABLED = True
+            SESSION_SWEEP_INTERVAL = 0
+
+        pool_app = create_app(PoolConfig)
+        with pool_app.app_context():
+            assert isinstance(db.engine.pool, TimedPoolMixin)
+            assert db.engine.pool.size() == 2
+            assert db.engine.pool._max_overflow == 1
+
+        with pool_app.test_client() as client:
+            client.get('/feed')
+            client.get('/feed')
+            body = client.get('/metrics').get_data(as_text=True)
+
+        checkouts = next(line for line in body.splitlines() if line.startswith('db_pool_checkouts_total{pool="primary"}'))
+        assert int(checkouts.split()[-1]) >= 2
+        assert 'db_pool_connections_in_use{pool="primary"} 0' in body
+        assert 'db_pool_wait_seconds_total{pool="sessions"}' in body
+        with pool_app.app_context():
+            db.engine.dispose()
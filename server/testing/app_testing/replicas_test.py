@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import tempfile
+
+from app import create_app
+from cache import user_cache
+from config import Config
+from models import db
+
+INSTRUCTIONS = 'Whisk the eggs, fold in the flour and fry in butter until golden on both sides.'
+
+def copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+class TestReadReplicas:
+    '''Read-replica routing in replicas.py'''
+
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.primary = os.path.join(self.tmp.name, 'primary.sqlite3')
+        self.replica = os.path.join(self.tmp.name, 'replica.sqlite3')
+
+        class ReplicaConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.primary}'
+            SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{self.replica}']
+            REPLICA_STICKY_SECONDS = 60
+            SESSION_SWEEP_INTERVAL = 0
+
+        self.app = create_app(ReplicaConfig)
+        with self.app.app_context():
+            db.create_all()
+        copy_database(self.primary, self.replica)
+
+    def teardown_method(self):
+        # The user cache is per process; don't leave these databases' rows in it
+        user_cache.clear()
+        with self.app.app_context():
+            db.engine.dispose()
+        for engine in self.app.extensions['db_replicas'].engines:
+            engine.dispose()
+        self.app.extensions['session_store'].engine.dispose()
+        self.tmp.cleanup()
+
+    def expire_stickiness(self, client):
+        with client.session_transaction() as session:
+            session['db_primary_until'] = 0
+
+    def set_replica_bio(self, bio):
+        with sqlite3.connect(self.replica) as replica:
+            replica.execute("UPDATE user SET bio = ?", (bio,))
+
+    def test_reads_from_replica_and_writes_to_primary(self):
+        '''sends GET reads to the replica once the session is no longer sticky, and writes to the primary.'''
+
+        client = self.app.test_client()
+        assert client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu', 'bio': 'primary'}).status_code == 201
+        copy_database(self.primary, self.replica)
+        self.set_replica_bio('replica')
+
+        self.expire_stickiness(client)
+        assert client.get('/check-session').get_json()['bio'] == 'replica'
+
+        response = client.post('/recipes', json={'title': 'Pancakes', 'instructions': INSTRUCTIONS, 'minutes_to_complete': 20})
+        assert response.status_code == 201
+        with sqlite3.connect(self.primary) as primary, sqlite3.connect(self.replica) as replica:
+            assert primary.execute("SELECT count(*) FROM recipe").fetchone()[0] == 1
+            assert replica.execute("SELECT count(*) FROM recipe").fetchone()[0] == 0
+
+    def test_reads_own_writes(self):
+        '''reads from the primary for a while after the session writes.'''
+
+        client = self.app.test_client()
+        client.post('/signup', json={'username': 'ashketchum', 'password': 'pikachu', 'bio': 'primary'})
+        copy_database(self.primary, self.replica)
+        self.set_replica_bio('replica')
+
+        # Sticky after signup: the primary's row, although the replica has one too
+        assert client.get('/check-session').get_json()['bio'] == 'primary'
+
+        client.post('/recipes', json={'title': 'Pancakes', 'instructions': INSTRUCTIONS, 'minutes_to_complete': 20})
+        assert [r['title'] for r in client.get('/recipes').get_json()] == ['Pancakes']
+
+        self.expire_stickiness(client)
+        assert client.get('/recipes').get_json() == []
+
+        # Another client has written nothing, so it reads from the replica
+        other = self.app.test_client()
+        other.post('/login', json={'username': 'ashketchum', 'password': 'pikachu'})
+        self.expire_stickiness(other)
+        user_cache.clear()
+        assert other.get('/check-session').get_json()['bio'] == 'replica'
@@ -0,0 +1,134 @@
+from sqlalchemy import event
+
+from app import app
+from models import db, User
+from cache import TTLCache, user_cache, load_user, load_users
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class TestTTLCache:
+    '''TTLCache in cache.py'''
+
+    def test_expires_entries(self):
+        '''drops entries once their ttl has passed.'''
+
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=30, clock=clock)
+        cache.set(1, 'ash')
+
+        clock.now = 29
+        assert cache.get(1) == 'ash'
+
+        clock.now = 30
+        assert cache.get(1) is None
+
+    def test_evicts_least_recently_used(self):
+        '''evicts the least recently used entry when full.'''
+
+        cache = TTLCache(maxsize=2, ttl=30)
+        cache.set(1, 'ash')
+        cache.set(2, 'misty')
+        cache.get(1)
+        cache.set(3, 'brock')
+
+        assert cache.get(1) == 'ash'
+        assert cache.get(2) is None
+        assert cache.get(3) == 'brock'
+
+class TestUserCache:
+    '''Session user cache in cache.py'''
+
+    def test_serves_cached_users(self):
+        '''returns users from the cache without querying the database.'''
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="ashketchum", bio="Pallet Town")
+            user.set_password("pikachu")
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        with app.app_context():
+            assert load_user(user_id).username == "ashketchum"
+            assert user_id in user_cache._data
+
+        with app.app_context():
+            # Remove the row behind the ORM's back; a cache hit never notices
+            db.session.execute(User.__table__.delete())
+            db.session.commit()
+
+            assert load_user(user_id).bio == "Pallet Town"
+
+        user_cache.clear()
+
+    def test_invalidates_on_change(self):
+        '''evicts users that are updated or deleted through the ORM.'''
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="ashketchum", bio="Pallet Town")
+            user.set_password("pikachu")
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        with app.app_context():
+            load_user(user_id).bio = "Viridian City"
+            db.session.commit()
+
+        with app.app_context():
+            assert load_user(user_id).bio == "Viridian City"
+
+            db.session.delete(load_user(user_id))
+            db.session.commit()
+
+        with app.app_context():
+            assert load_user(user_id) is None
+
+    def test_loads_many_users_at_once(self):
+        '''load_users() reads only the uncached users, with one query.'''
+
+        with app.app_context():
+
+            User.query.delete()
+            db.session.commit()
+
+            users = [User(username=name) for name in ("ashketchum", "misty", "brock")]
+            for user in users:
+                user.password_hash = "pikachu"
+            db.session.add_all(users)
+            db.session.commit()
+            ids = [user.id for user in users]
+            user_cache.clear()
+
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            load_user(ids[0])
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                found = load_users(ids + [ids[-1] + 100])
+                assert sorted(found) == ids
+                assert found[ids[1]]['username'] == "misty"
+                assert len(statements) == 1
+
+                assert load_users(ids) == found
+                assert len(statements) == 1
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+        user_cache.clear()
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from app import app
+from models import User
+from hashing import HASHERS, HashingPool, HashingUnavailable, hash_password, verify_password, needs_rehash
+
+# Cheap cost settings so the suite stays fast
+FAST_HASHING = {
+    'PBKDF2_ITERATIONS': 1000,
+    'BCRYPT_LOG_ROUNDS': 4,
+    'SCRYPT_N': 2 ** 10,
+}
+
+class TestPasswordHashers:
+    '''Password hashers in hashing.py'''
+
+    @pytest.mark.parametrize('name', sorted(HASHERS))
+    def test_hashes_and_verifies(self, name):
+        '''hashes passwords that verify with the right password only.'''
+
+        with app.app_context():
+            app.config.update(FAST_HASHING, PASSWORD_HASHER=name)
+            try:
+                hashed = hash_password('pikachu')
+
+                assert HASHERS[name].identify(hashed)
+                assert verify_password('pikachu', hashed)
+                assert not verify_password('raichu', hashed)
+                assert not needs_rehash(hashed)
+            finally:
+                app.config['PASSWORD_HASHER'] = 'pbkdf2'
+                for key in FAST_HASHING:
+                    app.config.pop(key)
+
+    def test_flags_outdated_hashes(self):
+        '''flags hashes from another hasher or with another cost for rehashing.'''
+
+        with app.app_context():
+            app.config.update(FAST_HASHING)
+            try:
+                hashed = hash_password('pikachu')
+                assert not needs_rehash(hashed)
+
+                app.config['PBKDF2_ITERATIONS'] = 2000
+                assert needs_rehash(hashed)
+
+                app.config['PASSWORD_HASHER'] = 'bcrypt'
+                assert needs_rehash(hashed)
+            finally:
+                app.config['PASSWORD_HASHER'] = 'pbkdf2'
+                for key in FAST_HASHING:
+                    app.config.pop(key)
+
+    def test_rehashes_on_authenticate(self):
+        '''upgrades an outdated hash when the user authenticates.'''
+
+        with app.app_context():
+            app.config.update(FAST_HASHING)
+            try:
+                user = User(username="Prabhdip")
+                user.set_password("pikachu")
+                old_hash = user.password_hash
+
+                app.config['PASSWORD_HASHER'] = 'bcrypt'
+
+                assert not user.authenticate("raichu")
+                assert user.password_hash == old_hash
+
+                assert user.authenticate("pikachu")
+                assert user.password_hash.startswith('$2b$04$')
+                assert user.authenticate("pikachu")
+            finally:
+                app.config['PASSWORD_HASHER'] = 'pbkdf2'
+                for key in FAST_HASHING:
+                    app.config.pop(key)
+
+class TestHashingPool:
+    '''Bounded hashing pool in hashing.py'''
+
+    def test_runs_jobs_in_app_context(self):
+        '''runs hashing jobs on worker threads with the app config available.'''
+
+        pool = HashingPool(workers=1, max_pending=0, timeout=5)
+        try:
+            with app.app_context():
+                hashed = pool.run(hash_password, 'pikachu')
+                assert verify_password('pikachu', hashed)
+        finally:
+            pool.shutdown()
+
+    def test_rejects_when_saturated(self):
+        '''rejects jobs immediately once workers and pending slots are taken.'''
+
+        pool = HashingPool(workers=1, max_pending=0, timeout=5)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        def run_slow():
+            with app.app_context():
+                pool.run(slow)
+
+        worker = threading.Thread(target=run_slow)
+        worker.start()
+        try:
+            assert started.wait(5)
+            with app.app_context():
+                with pytest.raises(HashingUnavailable):
+                    pool.run(hash_password, 'pikachu')
+        finally:
+            release.set()
+            worker.join()
+            pool.shutdown()
@@ -0,0 +1,56 @@
+from ratelimit import MemoryBackend, SQLiteBackend, RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+class TestRateLimiter:
+    '''RateLimiter in ratelimit.py'''
+
+    def test_rejects_after_burst_and_refills(self):
+        '''rejects once a bucket is empty and allows again after it refills.'''
+
+        clock = FakeClock()
+        limiter = RateLimiter(MemoryBackend(), {'username': (3, 30)}, clock=clock)
+
+        for _ in range(3):
+            assert limiter.hit([('username', 'ash')]) is None
+        assert limiter.hit([('username', 'ash')]) == 10
+
+        clock.now += 10
+        assert limiter.hit([('username', 'ash')]) is None
+        assert limiter.hit([('username', 'misty')]) is None
+
+    def test_refund_returns_token(self):
+        '''refund() gives back the token taken by hit().'''
+
+        limiter = RateLimiter(MemoryBackend(), {'username': (1, 60)}, clock=FakeClock())
+
+        assert limiter.hit([('username', 'ash')]) is None
+        limiter.refund([('username', 'ash')])
+        assert limiter.hit([('username', 'ash')]) is None
+        assert limiter.hit([('username', 'ash')]) is not None
+
+    def test_rejected_hit_keeps_other_buckets(self):
+        '''a hit rejected by one bucket doesn't drain the others.'''
+
+        limiter = RateLimiter(MemoryBackend(), {'ip': (2, 60), 'username': (1, 60)}, clock=FakeClock())
+
+        assert limiter.hit([('ip', '10.0.0.1'), ('username', 'ash')]) is None
+        assert limiter.hit([('ip', '10.0.0.1'), ('username', 'ash')]) is not None
+        assert limiter.hit([('ip', '10.0.0.1'), ('username', 'misty')]) is None
+
+    def test_sqlite_backend_shares_buckets(self, tmp_path):
+        '''the SQLite backend keeps buckets in a file every limiter can see.'''
+
+        clock = FakeClock()
+        path = str(tmp_path / 'ratelimit.sqlite3')
+        first = RateLimiter(SQLiteBackend(path), {'username': (2, 60)}, clock=clock)
+        second = RateLimiter(SQLiteBackend(path), {'username': (2, 60)}, clock=clock)
+
+        assert first.hit([('username', 'ash')]) is None
+        assert second.hit([('username', 'ash')]) is None
+        assert first.hit([('username', 'ash')]) == 30
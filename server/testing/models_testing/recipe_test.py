@@ -1,8 +1,11 @@
 import pytest
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
 from app import app
 from models import db, Recipe, User # <-- Added User import
+from queries import feed_query
 
 class TestRecipe:
     '''Recipe Model Tests'''
@@ -100,3 +103,59 @@ class TestRecipe:
                     )
                 db.session.add(recipe)
                 db.session.commit()
+
+    def test_detects_concurrent_updates(self):
+        '''raises StaleDataError when the row changed after it was loaded.'''
+
+        with app.app_context():
+
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+            user = User(username="Concurrent")
+            user.password_hash = 'secret'
+            recipe = Recipe(title="Stew", instructions="Brown the meat, add the vegetables and stock, then simmer.",
+                            minutes_to_complete=90, user=user)
+            db.session.add_all([user, recipe])
+            db.session.commit()
+            assert recipe.version == 1
+
+            # Another writer updates the row behind this session's back
+            with db.engine.begin() as conn:
+                conn.execute(text("UPDATE recipe SET title = 'Soup', version = 2 WHERE id = :id"), {"id": recipe.id})
+
+            recipe.title = "Goulash"
+            with pytest.raises(StaleDataError):
+                db.session.commit()
+            db.session.rollback()
+
+    def test_user_recipe_queries_use_index(self):
+        '''looks up a user's recipes through the (user_id, id) index instead of a table scan.'''
+
+        with app.app_context():
+
+            statement = Recipe.query.filter(Recipe.user_id == 1).order_by(Recipe.id) \
+                .limit(20).statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+            plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+            details = ' '.join(row[-1] for row in plan)
+
+            assert 'USING COVERING INDEX ix_recipe_user_id_id' in details \
+                or 'USING INDEX ix_recipe_user_id_id' in details
+            assert 'USE TEMP B-TREE' not in details
+
+    def test_feed_pages_use_covering_indexes(self):
+        '''picks each feed page's ids from a covering index before reading the rows.'''
+
+        with app.app_context():
+
+            for sort, options, index in (
+                ('quickest', {'min_minutes': 30, 'max_minutes': 60}, 'ix_recipe_minutes_to_complete_id_user_id'),
+                ('newest', {'author_id': 1}, 'ix_recipe_user_id_id'),
+            ):
+                statement = feed_query(sort, 21, **options) \
+                    .compile(db.engine, compile_kwargs={"literal_binds": True})
+                plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {statement}")).all()
+                details = ' '.join(row[-1] for row in plan)
+
+                assert f'USING COVERING INDEX {index}' in details
@@ -0,0 +1,39 @@
+from sqlalchemy import text
+
+from app import app
+from models import db, User, Recipe
+from seed import seed_database
+
+class TestSeed:
+    '''seed_database() in seed.py'''
+
+    def test_seeds_users_and_recipes(self):
+        '''inserts the requested rows, all searchable and able to log in.'''
+
+        with app.app_context():
+            assert seed_database(users=4, recipes_per_user=3, random_seed=1, echo=lambda _: None) == (4, 12)
+
+            assert User.query.count() == 4
+            assert Recipe.query.count() == 12
+            assert all(recipe.version == 1 for recipe in Recipe.query)
+            assert User.query.first().authenticate('password123')
+
+            indexed = db.session.execute(text("SELECT count(*) FROM recipe_fts WHERE recipe_fts MATCH 'a*'")).scalar()
+            matching = sum(1 for r in Recipe.query if any(w.lower().startswith('a') for w in (r.title + ' ' + r.instructions).split()))
+            assert indexed == matching
+
+    def test_appends(self):
+        '''keeps existing rows with append=True and still indexes the new ones.'''
+
+        with app.app_context():
+            seed_database(users=2, recipes_per_user=1, echo=lambda _: None)
+            seed_database(users=2, recipes_per_user=2, append=True, echo=lambda _: None)
+
+            assert User.query.count() == 4
+            assert Recipe.query.count() == 6
+            triggers = db.session.execute(text("SELECT count(*) FROM sqlite_master WHERE type='trigger' AND name LIKE 'recipe_fts_%'")).scalar()
+            assert triggers == 3
+
+            seed_database(users=0, echo=lambda _: None)
+            assert Recipe.query.count() == 0
+            assert db.session.execute(text("SELECT count(*) FROM recipe_fts WHERE recipe_fts MATCH 'a*'")).scalar() == 0
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from app import app
+from models import db, UserSession
+from sessions import SessionStore, utcnow
+
+def make_store():
+    with app.app_context():
+        UserSession.query.delete()
+        db.session.commit()
+        return SessionStore(db.engine)
+
+class TestSessionStore:
+    '''SessionStore in sessions.py'''
+
+    def test_saves_and_loads(self):
+        '''round-trips session data until it expires.'''
+
+        store = make_store()
+        expires_at = utcnow() + timedelta(hours=1)
+        store.save('abc', 1, {'user_id': 1, 'theme': 'dark'}, expires_at)
+
+        assert store.load('abc') == ({'user_id': 1, 'theme': 'dark'}, expires_at)
+
+        store.save('old', 1, {'user_id': 1}, utcnow() - timedelta(seconds=1))
+        assert store.load('old') is None
+        assert store.load('missing') is None
+
+    def test_revokes_all_user_sessions(self):
+        '''revoke_user() deletes every session of one user, cached or not.'''
+
+        store = make_store()
+        expires_at = utcnow() + timedelta(hours=1)
+        store.save('a1', 1, {'user_id': 1}, expires_at)
+        store.save('a2', 1, {'user_id': 1}, expires_at)
+        store.save('b1', 2, {'user_id': 2}, expires_at)
+
+        assert store.revoke_user(1) == 2
+        assert store.load('a1') is None
+        assert store.load('a2') is None
+        assert store.load('b1') is not None
+
+    def test_sweeps_expired_sessions_in_batches(self):
+        '''sweep() deletes only expired rows, however many batches it takes.'''
+
+        store = make_store()
+        past = utcnow() - timedelta(minutes=1)
+        for i in range(25):
+            store.save(f'expired{i}', 1, {'user_id': 1}, past)
+        store.save('live', 1, {'user_id': 1}, utcnow() + timedelta(hours=1))
+
+        assert store.sweep(batch_size=10, pause=0) == 25
+        with app.app_context():
+            assert [s.id for s in UserSession.query.all()] == ['live']
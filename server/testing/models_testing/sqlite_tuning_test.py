@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from sqlite_tuning import SQLITE_PROFILES, apply_sqlite_pragmas, get_sqlite_pragmas
+
+class TestSQLiteTuning:
+    '''SQLite connection profiles in sqlite_tuning.py'''
+
+    def test_merges_overrides(self):
+        '''applies SQLITE_PRAGMAS on top of the selected profile.'''
+
+        pragmas = get_sqlite_pragmas({
+            'SQLITE_PROFILE': 'production',
+            'SQLITE_PRAGMAS': {'busy_timeout': 100},
+        })
+
+        assert pragmas['journal_mode'] == 'WAL'
+        assert pragmas['busy_timeout'] == 100
+
+        with pytest.raises(ValueError):
+            get_sqlite_pragmas({'SQLITE_PROFILE': 'turbo'})
+
+    def test_sets_pragmas_on_connect(self, tmp_path):
+        '''runs the profile PRAGMAs on every new connection.'''
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'tuned.sqlite3'}")
+        apply_sqlite_pragmas(engine, SQLITE_PROFILES['production'])
+
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+        engine.dispose()
@@ -0,0 +1,101 @@
+from sqlalchemy import text, update
+
+from app import app
+from models import db, User, Recipe
+from seed import seed_database
+from stats import reconcile_user_stats
+
+INSTRUCTIONS = "Brown the meat, add the vegetables and stock, then simmer."
+
+class TestUserStats:
+    '''User.recipe_count and User.total_minutes in stats.py'''
+
+    def setup_method(self):
+        with app.app_context():
+            Recipe.query.delete()
+            User.query.delete()
+            db.session.commit()
+
+    def make_users(self):
+        first = User(username="Prabhdip")
+        first.password_hash = 'secret'
+        second = User(username="Ash")
+        second.password_hash = 'secret'
+        db.session.add_all([first, second])
+        db.session.commit()
+        return first, second
+
+    def stats(self, user):
+        db.session.expire(user)
+        return user.recipe_count, user.total_minutes
+
+    def test_triggers_follow_recipe_writes(self):
+        '''are adjusted on insert, update, owner change and delete.'''
+
+        with app.app_context():
+            first, second = self.make_users()
+            stew = Recipe(title="Stew", instructions=INSTRUCTIONS, minutes_to_complete=90, user=first)
+            soup = Recipe(title="Soup", instructions=INSTRUCTIONS, minutes_to_complete=None, user=first)
+            db.session.add_all([stew, soup])
+            db.session.commit()
+            assert self.stats(first) == (2, 90)
+            # Like AVG, the recipe without a duration doesn't count
+            assert first.timed_recipe_count == 1
+            assert first.average_minutes == 90
+
+            soup.minutes_to_complete = 30
+            db.session.commit()
+            assert self.stats(first) == (2, 120)
+            assert first.average_minutes == 60
+
+            soup.minutes_to_complete = None
+            db.session.commit()
+            assert self.stats(first) == (2, 90)
+            assert first.average_minutes == 90
+
+            stew.minutes_to_complete = 60
+            db.session.commit()
+            assert self.stats(first) == (2, 60)
+
+            stew.user = second
+            db.session.commit()
+            assert self.stats(first) == (1, 0)
+            assert first.timed_recipe_count == 0
+            assert first.average_minutes is None
+            assert self.stats(second) == (1, 60)
+            assert second.timed_recipe_count == 1
+
+            db.session.execute(text("DELETE FROM recipe WHERE id = :id"), {'id': stew.id})
+            db.session.commit()
+            assert self.stats(second) == (0, 0)
+            assert second.average_minutes is None
+
+    def test_reconcile_repairs_drift(self):
+        '''reconcile_user_stats() recomputes drifted users and bumps their data_version.'''
+
+        with app.app_context():
+            first, second = self.make_users()
+            db.session.add(Recipe(title="Stew", instructions=INSTRUCTIONS, minutes_to_complete=90, user=first))
+            db.session.commit()
+            version = first.data_version
+            db.session.execute(update(User).where(User.id == first.id).values(recipe_count=5, timed_recipe_count=0, total_minutes=1))
+            db.session.commit()
+
+            assert reconcile_user_stats(db.session) == 1
+            db.session.commit()
+            assert self.stats(first) == (1, 90)
+            assert first.timed_recipe_count == 1
+            assert first.data_version == version + 1
+            assert reconcile_user_stats(db.session) == 0
+
+    def test_seed_fills_stats(self):
+        '''are computed for seeded users, with the insert trigger restored afterwards.'''
+
+        with app.app_context():
+            seed_database(users=3, recipes_per_user=4, random_seed=1, echo=lambda _: None)
+
+            for user in User.query:
+                minutes = sum(recipe.minutes_to_complete for recipe in user.recipes)
+                assert (user.recipe_count, user.timed_recipe_count, user.total_minutes) == (4, 4, minutes)
+            triggers = db.session.execute(text("SELECT count(*) FROM sqlite_master WHERE type='trigger' AND name LIKE 'recipe_stats_%'")).scalar()
+            assert triggers == 3